@@ -1,10 +1,57 @@
 __version__ = '1.1.0'
 
-from .importer_csv import CEImporter_CSV
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Mapping, Union
+
+from .batch import extract_batch
+from .cache import LRUCache, file_key
+from .extract_statement import PDF_MAGIC, PDF_MAGIC_WINDOW
+from .importer_csv import CSV_DELIMITER, CEImporter_CSV
 from .importer_pdf import CEImporter_PDF
+from .operation import Operation
+from .operation_types import OperationClassifier, register_operation_type
+from .payee_rules import PayeeRules, as_payee_rules
+from .stats import ImportStats
 
 from beancount.ingest import importer
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+ROUTE_CACHE_SIZE = 1024
+# Sub-importers identifying each kind of file, the likeliest first: the text
+# of a PDF statement may also hold a ';' on its first line.
+ROUTES = {'pdf': ('pdf',), 'csv': ('csv', 'pdf'), 'text': ('pdf', 'csv')}
+
+
+def read_head(path: str) -> bytes:
+    """First bytes of a file, enough for sniff_file_kind.
+
+    It is a converter of beancount's file memos: file_.convert(read_head)
+    reads the file once however many times it is sniffed.
+    """
+    with open(path, 'rb') as fd:
+        return fd.read(PDF_MAGIC_WINDOW)
+
+
+def sniff_file_kind(path: str, head: bytes = None) -> str:
+    """Kind of statement a file may be, from its first bytes.
+
+    Args:
+        path (str): File to sniff.
+        head (bytes, optional): First bytes of the file, as returned by read_head. Defaults to None, read from path.
+
+    Returns:
+        str: 'pdf' for PDF documents, 'csv' when the first line is delimited like CSV exports, 'text' otherwise (e.g. text extracted from a PDF statement).
+    """
+    if head is None:
+        head = read_head(path)
+    if PDF_MAGIC in head:
+        return 'pdf'
+    if CSV_DELIMITER.encode('ascii') in head.split(b'\n', 1)[0]:
+        return 'csv'
+    return 'text'
+
 
 class CEImporter(importer.ImporterProtocol):
     """Beancount Importer for Caisse d'Epargne PDF and CSV statement.
@@ -15,7 +62,19 @@ class CEImporter(importer.ImporterProtocol):
         file_type (int): Define file type treated by this importer instance: 0 -> PDF and CSV, 1 -> only PDF, 2 -> only CSV. Defaults to PDF and CSV.
         expenseCat (str, optional): Expense category in beancount format (e.g. 'Expenses:FIXME'). Defaults to '', no expense posting added to the operation.
         creditCat (str, optional): Income category in beancount format (e.g. 'Income:FIXME'). Defaults to '', no income posting added to the operation.
-        showOperationTypes (bool, optional): Show or not operation type (CARDDEBIT, WIRETRANSFER, CHECK ...) in header. Only possible for PDF statements. Defaults to False.
+        showOperationTypes (bool, optional): Show or not operation type (CARDDEBIT, WIRETRANSFER, CHECK ...) in header. Defaults to False.
+        cache_dir (str, optional): Directory where the text extracted from PDF statements is kept between runs. Defaults to '', no persistent cache.
+        fast_identify (bool, optional): Identify PDF statements from their raw content and first page before falling back to the full text. Defaults to True.
+        accounts (Mapping[str, str], optional): Account name in beancount format for each other International Bank Account Number to extract from the same PDF statements. Defaults to None, only 'iban' is extracted.
+        state_dir (str, optional): Directory where the statements and CSV rows already imported are recorded, to skip them on later runs. Defaults to '', everything is imported.
+        extraction_profile (str, optional): Name of the layout analysis profile used to extract the text of PDF statements ('default', 'fast' or 'lean'). Defaults to 'default'.
+        engine (str, optional): 'text' parses the text of PDF statements with regexes, 'layout' reads the columns of each operation from the position of its words, falling back to 'text' when they are not lined up with their columns. Defaults to 'text'.
+        on_stats (Callable[[ImportStats], None], optional): Called with the time spent in each stage and the counters of every extracted file. Defaults to None.
+        log_stats (bool, optional): Log these stats as a JSON line on the 'beancount_ce' logger, at INFO level. Defaults to False.
+        csv_workers (int, optional): Number of processes parsing chunks of memory mapped CSV exports, None for one per CPU. Defaults to 0, exports are read line by line.
+        payee_rules (Union[PayeeRules, Mapping[str, str]], optional): Rules picking the counter-posting account from the payee, in place of expenseCat or creditCat. A mapping is read as literal rules, the account of the payees containing each text. Defaults to None.
+        operation_types (Mapping[str, str], optional): Operation type of the labels starting with each prefix, added to OPERATION_TYPES (e.g. {'PAIEMENT CB': 'CARDDEBIT'}). Defaults to None.
+        cache_operations (bool, optional): Keep the operations read from each PDF statement in cache_dir, so later runs only build the entries. Defaults to False.
     """
 
     def __init__(
@@ -26,6 +85,18 @@ class CEImporter(importer.ImporterProtocol):
         expenseCat: str = '',
         creditCat: str = '',
         showOperationTypes: bool = False,
+        cache_dir: str = '',
+        fast_identify: bool = True,
+        accounts: Mapping[str, str] = None,
+        state_dir: str = '',
+        extraction_profile: str = 'default',
+        engine: str = 'text',
+        on_stats: Callable[[ImportStats], None] = None,
+        log_stats: bool = False,
+        csv_workers: int = 0,
+        payee_rules: Union[PayeeRules, Mapping[str, str]] = None,
+        operation_types: Mapping[str, str] = None,
+        cache_operations: bool = False,
     ):
         self.iban = iban
         self.account = account
@@ -33,6 +104,21 @@ class CEImporter(importer.ImporterProtocol):
         self.creditCat = creditCat
         self.showOperationTypes = showOperationTypes
         self.file_type = file_type
+        self.cache_dir = cache_dir
+        self.fast_identify = fast_identify
+        self.accounts = accounts
+        self.state_dir = state_dir
+        self.extraction_profile = extraction_profile
+        self.engine = engine
+        self.on_stats = on_stats
+        self.log_stats = log_stats
+        self.csv_workers = csv_workers
+        # compiled once, shared by the PDF and CSV importers
+        self.payee_rules = as_payee_rules(payee_rules)
+        self.operation_types = operation_types
+        self.cache_operations = cache_operations
+
+        self._routes = LRUCache(maxsize=ROUTE_CACHE_SIZE)
 
         assert self.file_type in [0, 1, 2]
         if self.file_type in [0, 2]:
@@ -41,6 +127,13 @@ class CEImporter(importer.ImporterProtocol):
                 expenseCat=self.expenseCat,
                 creditCat=self.creditCat,
                 iban=self.iban,
+                state_dir=self.state_dir,
+                on_stats=self.on_stats,
+                log_stats=self.log_stats,
+                workers=self.csv_workers,
+                payee_rules=self.payee_rules,
+                showOperationTypes=self.showOperationTypes,
+                operation_types=self.operation_types,
             )
         if self.file_type in [0, 1]:
             self.pdf_importer = CEImporter_PDF(
@@ -49,20 +142,38 @@ class CEImporter(importer.ImporterProtocol):
                 expenseCat=self.expenseCat,
                 creditCat=self.creditCat,
                 showOperationTypes=self.showOperationTypes,
+                cache_dir=self.cache_dir,
+                fast_identify=self.fast_identify,
+                accounts=self.accounts,
+                state_dir=self.state_dir,
+                extraction_profile=self.extraction_profile,
+                engine=self.engine,
+                on_stats=self.on_stats,
+                log_stats=self.log_stats,
+                payee_rules=self.payee_rules,
+                operation_types=self.operation_types,
+                cache_operations=self.cache_operations,
             )
 
     def _get_importer(self, file_):
-        ext_str = file_.name.split('.')[-1].lower()
-        if self.file_type == 0:
-            if self.pdf_importer.identify(file_):
-                return self.pdf_importer
-            if self.csv_importer.identify(file_):
-                return self.csv_importer
-        if (self.file_type == 1) and self.pdf_importer.identify(file_):
-            return self.pdf_importer
-        if (self.file_type == 2) and self.csv_importer.identify(file_):
-            return self.csv_importer
-        return None
+        try:
+            key = file_key(file_.name)
+        except (OSError, TypeError, ValueError):
+            return None
+        route = self._routes.get(key, '')
+        if route == '':
+            # beancount's file memos keep the head between calls, other
+            # files are read from their path
+            convert = getattr(file_, 'convert', None)
+            head = convert(read_head) if convert else None
+            route = None
+            for kind in ROUTES[sniff_file_kind(key[0], head)]:
+                importer = getattr(self, kind + '_importer', None)
+                if importer is not None and importer.identify(file_):
+                    route = kind
+                    break
+            self._routes.put(key, route)
+        return getattr(self, route + '_importer') if route else None
 
     ## API Methods ##
     #################
@@ -83,16 +194,117 @@ class CEImporter(importer.ImporterProtocol):
         return importer.file_name(file_) if importer else None
 
     def identify(self, file_) -> bool:
-        if self.file_type == 0:
-            return self.pdf_importer.identify(
-                file_
-            ) or self.csv_importer.identify(file_)
-        if self.file_type == 1:
-            return self.pdf_importer.identify(file_)
-        if self.file_type == 2:
-            return self.csv_importer.identify(file_)
-        return False
+        return self._get_importer(file_) is not None
 
     def extract(self, file_, existing_entries=None):
         importer = self._get_importer(file_)
         return importer.extract(file_, existing_entries) if importer else None
+
+    ## Async API ##
+    #################
+
+    async def aidentify(self, file_, executor: 'Executor' = None) -> bool:
+        """identify, run in an executor so the event loop is not blocked."""
+        return await self._run_in_executor(executor, self.identify, file_)
+
+    async def afile_date(self, file_, executor: 'Executor' = None):
+        """file_date, run in an executor so the event loop is not blocked."""
+        return await self._run_in_executor(executor, self.file_date, file_)
+
+    async def aextract(
+        self, file_, existing_entries=None, executor: 'Executor' = None
+    ):
+        """extract, run in an executor so the event loop is not blocked.
+
+        Calls only share the caches of the process (extracted text, routes,
+        digests), which are safe to use from several threads, so any number
+        of files can be extracted at once.
+
+        Args:
+            file_ (_FileMemo): File to extract, as given by beancount.ingest.cache.get_file.
+            existing_entries (list, optional): Entries already in the ledger.
+            executor (Executor, optional): Executor running the extraction. Defaults to None, the default executor of the event loop. Each worker of a ProcessPoolExecutor works on its own copy of the importer and caches.
+        """
+        return await self._run_in_executor(
+            executor, self.extract, file_, existing_entries
+        )
+
+    def _run_in_executor(self, executor, function, *args):
+        # asyncio is left out of the start-up of synchronous imports
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(executor, partial(function, *args))
+
+    def extract_batch(
+        self, source: str, max_workers: int = None, existing_entries=None
+    ):
+        """Extract every statement of a directory or glob pattern in a pool of processes.
+
+        Returns:
+            list: (path, entries) for each identified statement, sorted by path.
+        """
+        return extract_batch(self, source, max_workers, existing_entries)
+
+
+class CEMultiImporter(CEImporter):
+    """Beancount Importer for Caisse d'Epargne PDF statements covering several accounts.
+
+    The text of a statement is extracted and split by account once, and a
+    single call to extract returns the transactions of every mapped account.
+
+    Attributes:
+        accounts (Mapping[str, str]): Account name in beancount format for each International Bank Account Number (e.g. {'FR00 1111 2222 3333 4444 5555 666': 'Assets:FR:CdE:CompteCourant'}). The first account is the one statements are filed in.
+        expenseCat (str, optional): Expense category in beancount format (e.g. 'Expenses:FIXME'). Defaults to '', no expense posting added to the operation.
+        creditCat (str, optional): Income category in beancount format (e.g. 'Income:FIXME'). Defaults to '', no income posting added to the operation.
+        showOperationTypes (bool, optional): Show or not operation type (CARDDEBIT, WIRETRANSFER, CHECK ...) in header. Defaults to False.
+        cache_dir (str, optional): Directory where the text extracted from PDF statements is kept between runs. Defaults to '', no persistent cache.
+        fast_identify (bool, optional): Identify PDF statements from their raw content and first page before falling back to the full text. Defaults to True.
+        state_dir (str, optional): Directory where the statements already imported are recorded, to skip them on later runs. Defaults to '', every statement is imported.
+        extraction_profile (str, optional): Name of the layout analysis profile used to extract the text of PDF statements ('default', 'fast' or 'lean'). Defaults to 'default'.
+        engine (str, optional): 'text' parses the text of PDF statements with regexes, 'layout' reads the columns of each operation from the position of its words, falling back to 'text' when they are not lined up with their columns. Defaults to 'text'.
+        on_stats (Callable[[ImportStats], None], optional): Called with the time spent in each stage and the counters of every extracted file. Defaults to None.
+        log_stats (bool, optional): Log these stats as a JSON line on the 'beancount_ce' logger, at INFO level. Defaults to False.
+        payee_rules (Union[PayeeRules, Mapping[str, str]], optional): Rules picking the counter-posting account from the payee, in place of expenseCat or creditCat. A mapping is read as literal rules, the account of the payees containing each text. Defaults to None.
+        operation_types (Mapping[str, str], optional): Operation type of the labels starting with each prefix, added to OPERATION_TYPES (e.g. {'PAIEMENT CB': 'CARDDEBIT'}). Defaults to None.
+        cache_operations (bool, optional): Keep the operations read from each PDF statement in cache_dir, so later runs only build the entries. Defaults to False.
+    """
+
+    def __init__(
+        self,
+        accounts: Mapping[str, str],
+        expenseCat: str = '',
+        creditCat: str = '',
+        showOperationTypes: bool = False,
+        cache_dir: str = '',
+        fast_identify: bool = True,
+        state_dir: str = '',
+        extraction_profile: str = 'default',
+        engine: str = 'text',
+        on_stats: Callable[[ImportStats], None] = None,
+        log_stats: bool = False,
+        payee_rules: Union[PayeeRules, Mapping[str, str]] = None,
+        operation_types: Mapping[str, str] = None,
+        cache_operations: bool = False,
+    ):
+        assert len(accounts) > 0
+        (iban, account) = next(iter(accounts.items()))
+        super().__init__(
+            iban,
+            account,
+            file_type=1,
+            expenseCat=expenseCat,
+            creditCat=creditCat,
+            showOperationTypes=showOperationTypes,
+            cache_dir=cache_dir,
+            fast_identify=fast_identify,
+            accounts=accounts,
+            state_dir=state_dir,
+            extraction_profile=extraction_profile,
+            engine=engine,
+            on_stats=on_stats,
+            log_stats=log_stats,
+            payee_rules=payee_rules,
+            operation_types=operation_types,
+            cache_operations=cache_operations,
+        )
@@ -0,0 +1,137 @@
+import argparse
+import glob
+import logging
+import os
+import sys
+
+# Importer and ledger entries of a worker process of extract_batch, sent
+# once to each worker rather than along with every file.
+_worker_args = None
+
+
+def find_statements(source: str) -> list:
+    """List the files of a directory, or the files matched by a glob pattern, sorted by path."""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(os.path.expanduser(source), recursive=True)
+    return sorted(
+        os.path.abspath(path) for path in paths if os.path.isfile(path)
+    )
+
+
+def _extract_file(importer, existing_entries, path):
+    # loaded on first use, as beancount's file type guessing and the process
+    # pool add to the start-up time of every importer configuration
+    from beancount.ingest import cache as ingest_cache
+
+    file_ = ingest_cache.get_file(path)
+    if not importer.identify(file_):
+        return None
+    return importer.extract(file_, existing_entries)
+
+
+def _init_worker(importer, existing_entries):
+    global _worker_args
+    _worker_args = (importer, existing_entries)
+
+
+def _extract_in_worker(path):
+    (importer, existing_entries) = _worker_args
+    return _extract_file(importer, existing_entries, path)
+
+
+def extract_batch(
+    importer, source: str, max_workers: int = None, existing_entries=None
+) -> list:
+    """Extract every statement of a directory or glob pattern in a pool of processes.
+
+    Args:
+        importer (ImporterProtocol): Importer run on each file, it must be picklable.
+        source (str): Directory or glob pattern of the statements.
+        max_workers (int, optional): Number of worker processes. Defaults to None, one per CPU. 1 extracts in the calling process.
+        existing_entries (list, optional): Entries already in the ledger, forwarded to the importer.
+
+    Returns:
+        list: (path, entries) for each file identified by the importer, sorted by path.
+    """
+    paths = find_statements(source)
+    if max_workers == 1 or len(paths) <= 1:
+        results = [
+            _extract_file(importer, existing_entries, path) for path in paths
+        ]
+    else:
+        # unlike ProcessPoolExecutor before Python 3.7, Pool takes an
+        # initializer: the importer and the ledger are pickled once per
+        # worker, and only paths go through the task queue
+        from multiprocessing import Pool
+
+        with Pool(
+            max_workers, _init_worker, (importer, existing_entries)
+        ) as pool:
+            results = pool.map(_extract_in_worker, paths, chunksize=1)
+    return [
+        (path, entries)
+        for (path, entries) in zip(paths, results)
+        if entries is not None
+    ]
+
+
+def main(argv=None):
+    from beancount.parser import printer
+
+    from . import CEImporter
+
+    parser = argparse.ArgumentParser(
+        description='Extract Caisse d\'Epargne statements in parallel.'
+    )
+    parser.add_argument('source', help='directory or glob of statements')
+    parser.add_argument('--iban', required=True)
+    parser.add_argument('--account', required=True)
+    parser.add_argument('--file-type', type=int, default=0)
+    parser.add_argument('--expense-cat', default='')
+    parser.add_argument('--credit-cat', default='')
+    parser.add_argument('--cache-dir', default='')
+    parser.add_argument(
+        '--cache-operations',
+        action='store_true',
+        help='keep the operations read from each statement in --cache-dir',
+    )
+    parser.add_argument('--state-dir', default='')
+    parser.add_argument('--profile', default='default')
+    parser.add_argument('--engine', default='text', choices=['text', 'layout'])
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument(
+        '--log-stats',
+        action='store_true',
+        help='log the time spent in each stage of every import on stderr',
+    )
+    args = parser.parse_args(argv)
+
+    if args.log_stats:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    importer = CEImporter(
+        args.iban,
+        args.account,
+        file_type=args.file_type,
+        expenseCat=args.expense_cat,
+        creditCat=args.credit_cat,
+        cache_dir=args.cache_dir,
+        cache_operations=args.cache_operations,
+        state_dir=args.state_dir,
+        extraction_profile=args.profile,
+        engine=args.engine,
+        log_stats=args.log_stats,
+    )
+    for (path, entries) in importer.extract_batch(
+        args.source, max_workers=args.workers
+    ):
+        print('**** {}'.format(path))
+        print()
+        printer.print_entries(entries, file=sys.stdout)
+        print()
+
+
+if __name__ == "__main__":
+    main()
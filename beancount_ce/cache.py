@@ -0,0 +1,169 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+from .stats import logger
+
+TEXT_CACHE_SIZE = 32
+DISK_CACHE_SIZE = 256 * 1024 * 1024
+DISK_CACHE_SUFFIX = '.z'
+
+
+def file_key(path):
+    """Identify a file by its absolute path, size and modification time.
+
+    A file rewritten in place gets a new key, so cached results computed from
+    its previous content are never served again.
+    """
+    path = os.fspath(path)
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class LRUCache:
+    """Bounded in-memory mapping evicting the least recently used entries.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept before evicting the least recently used one.
+    """
+
+    def __init__(self, maxsize: int = TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Entries stay with the process that computed them.
+        return {'maxsize': self.maxsize}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_digest_cache = LRUCache(maxsize=1024)
+
+
+def file_digest(path) -> str:
+    """SHA-256 of the file content, remembered per path, size and mtime."""
+    key = file_key(path)
+    digest = _digest_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(key[0], 'rb') as fd:
+            for block in iter(lambda: fd.read(1 << 20), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        _digest_cache.put(key, digest)
+    return digest
+
+
+def make_key(*parts) -> str:
+    """Hash any number of parts into a key usable as a file name."""
+    return hashlib.sha256(
+        '\0'.join(str(part) for part in parts).encode('utf8')
+    ).hexdigest()
+
+
+class DiskCache:
+    """Directory of zlib compressed blobs shared between runs.
+
+    Reading an entry refreshes its modification time, and entries are pruned
+    least recently used first whenever the directory grows over its size cap.
+
+    Attributes:
+        directory (str): Directory where blobs are stored. Created on first write.
+        max_size (int, optional): Maximum total size of the blobs in bytes. Defaults to 256 MiB.
+    """
+
+    def __init__(self, directory: str, max_size: int = DISK_CACHE_SIZE):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + DISK_CACHE_SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fd:
+                value = zlib.decompress(fd.read())
+            os.utime(path)
+        except (OSError, zlib.error):
+            return None
+        return value
+
+    def put(self, key, value: bytes):
+        """Store value under key, warning instead of failing on OSError.
+
+        The cache only saves work, so an import goes on without it when its
+        directory is read-only or full.
+        """
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(zlib.compress(value))
+            os.replace(tmp_path, self._path(key))
+            tmp_path = None
+            self.prune()
+        except OSError as error:
+            logger.warning('Cache %s not updated: %s', self.directory, error)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _entries(self):
+        try:
+            return [
+                (entry.stat(), entry.path)
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(DISK_CACHE_SUFFIX)
+            ]
+        except FileNotFoundError:
+            return []
+
+    def prune(self, max_size: int = None):
+        if max_size is None:
+            max_size = self.max_size
+        entries = self._entries()
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in sorted(entries, key=lambda e: e[0].st_mtime_ns):
+            if total <= max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+
+    def clear(self):
+        self.prune(max_size=0)
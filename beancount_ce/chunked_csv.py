@@ -0,0 +1,177 @@
+import codecs
+import io
+import mmap
+import os
+from typing import BinaryIO, Callable, Iterator, List, Tuple
+
+CHUNK_SIZE = 8 * 1024 * 1024
+HEAD_SIZE = 64 * 1024
+DEFAULT_ENCODING = 'utf-8'
+# Exports saved by spreadsheet software on Windows.
+FALLBACK_ENCODING = 'cp1252'
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+
+
+def detect_encoding(head: bytes) -> Tuple[str, int]:
+    """Encoding of a file from its first bytes, and the length of its BOM.
+
+    Files without BOM are read as UTF-8, unless their first bytes are not
+    valid UTF-8. Text decoded later on that turns out not to be UTF-8 either
+    is read as cp1252.
+    """
+    for (bom, encoding) in BOMS:
+        if head.startswith(bom):
+            return (encoding, len(bom))
+    try:
+        head.decode(DEFAULT_ENCODING)
+    except UnicodeDecodeError as error:
+        # a character may be cut at the end of the head
+        if error.reason != 'unexpected end of data':
+            return (FALLBACK_ENCODING, 0)
+    return (DEFAULT_ENCODING, 0)
+
+
+def record_bounds(
+    buffer, start: int, chunk_size: int = CHUNK_SIZE
+) -> List[Tuple[int, int]]:
+    """Cut buffer[start:] in chunks of about chunk_size bytes of whole records.
+
+    A chunk ends with a line break outside of any quoted field: the quotes
+    from the start of the chunk to the line break come in pairs, escaped
+    quotes ("") included.
+    """
+    bounds = []
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(b'\n', start + chunk_size)
+        quotes = buffer[start:end].count(b'"') if end != -1 else 0
+        while end != -1 and quotes % 2:
+            next_end = buffer.find(b'\n', end + 1)
+            if next_end != -1:
+                quotes += buffer[end:next_end].count(b'"')
+            end = next_end
+        if end == -1:
+            bounds.append((start, size))
+            break
+        bounds.append((start, end + 1))
+        start = end + 1
+    return bounds
+
+
+class MappedCSV:
+    """CSV file memory mapped and cut in chunks of whole records.
+
+    Only the header and the first records are decoded when opening the file,
+    each chunk is decoded when it is parsed, possibly in another process.
+    UTF-16 files, whose line breaks span two bytes, are a single chunk.
+
+    Attributes:
+        path (str): CSV file.
+        chunk_size (int, optional): Approximate size of the chunks in bytes. Defaults to CHUNK_SIZE, 8 MiB.
+    """
+
+    def __init__(self, path: str, chunk_size: int = None):
+        self.path = os.fspath(path)
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.encoding = DEFAULT_ENCODING
+        self.header = ''
+        self.chunks = []
+        self._text = None
+        with open(self.path, 'rb') as fd:
+            if os.fstat(fd.fileno()).st_size == 0:
+                return
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self._map(buffer)
+
+    def _map(self, buffer):
+        (self.encoding, start) = detect_encoding(buffer[:HEAD_SIZE])
+        if self.encoding.startswith('utf-16'):
+            (self.header, _, self._text) = (
+                buffer[start:].decode(self.encoding).partition('\n')
+            )
+            self.chunks = [(start, len(buffer))]
+        else:
+            end = buffer.find(b'\n', start)
+            end = len(buffer) if end == -1 else end
+            self.header = buffer[start:end].decode(self.encoding)
+            self.chunks = record_bounds(buffer, end + 1, self.chunk_size)
+        self.header = self.header.rstrip('\r')
+
+    def head(self) -> str:
+        """First records of the file, the last one possibly cut."""
+        if self._text is not None:
+            return self._text[:HEAD_SIZE]
+        if not self.chunks:
+            return ''
+        (start, end) = self.chunks[0]
+        return _decode(
+            self.path,
+            self.encoding,
+            (start, min(end, start + HEAD_SIZE)),
+            # a character may be cut at the end of the head
+            final=False,
+        )
+
+    def map(self, function: Callable[[str], object], max_workers=1) -> list:
+        """function applied to the text of each chunk, results in file order.
+
+        Args:
+            function (Callable[[str], object]): Parser of a chunk of records. It must be picklable to run in other processes.
+            max_workers (int, optional): Number of worker processes, None for one per CPU. Defaults to 1, chunks are parsed one after the other in this process.
+        """
+        if self._text is not None:
+            return [function(self._text)]
+        if max_workers == 1 or len(self.chunks) <= 1:
+            return [
+                function(_decode(self.path, self.encoding, bounds))
+                for bounds in self.chunks
+            ]
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        with ProcessPoolExecutor(max_workers) as executor:
+            return list(
+                executor.map(
+                    partial(_parse_chunk, self.path, self.encoding, function),
+                    self.chunks,
+                )
+            )
+
+
+def iter_lines(fd: BinaryIO) -> Iterator[str]:
+    """Lines of a file open in binary mode, decoded as MappedCSV decodes its chunks."""
+    (encoding, start) = detect_encoding(fd.read(HEAD_SIZE))
+    fd.seek(start)
+    if encoding.startswith('utf-16'):
+        yield from io.TextIOWrapper(fd, encoding, newline='')
+        return
+    for line in fd:
+        yield _decode_text(line, encoding)
+
+
+def _decode(path, encoding, bounds, final=True):
+    (start, end) = bounds
+    with open(path, 'rb') as fd, mmap.mmap(
+        fd.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        return _decode_text(buffer[start:end], encoding, final)
+
+
+def _decode_text(data, encoding, final=True):
+    # decoding is strict: a UTF-8 guess made from the head of the file is
+    # taken back for the text that is not UTF-8, and any other invalid byte
+    # raises UnicodeDecodeError
+    try:
+        return codecs.getincrementaldecoder(encoding)().decode(data, final)
+    except UnicodeDecodeError:
+        if encoding != DEFAULT_ENCODING:
+            raise
+        return data.decode(FALLBACK_ENCODING)
+
+
+def _parse_chunk(path, encoding, function, bounds):
+    return function(_decode(path, encoding, bounds))
@@ -0,0 +1,244 @@
+"""Columnar reader of CSV exports, for analytics over large histories.
+
+Needs numpy, and pyarrow for the Arrow and Parquet exports; both come with
+the 'columnar' extra: pip install beancount-ce[columnar]
+"""
+
+import csv
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from operator import itemgetter
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError as error:
+    raise ImportError(
+        'beancount_ce.columnar needs numpy: '
+        'pip install beancount-ce[columnar]'
+    ) from error
+
+from .importer_csv import (
+    CSV_DELIMITER,
+    DATE_COLUMN,
+    date_parser,
+    detect_date_pattern,
+    operation_transaction,
+)
+from .payee_rules import PayeeRules
+
+COLUMNS = (
+    DATE_COLUMN,
+    'Libelle operation',
+    'Libelle simplifie',
+    'Debit',
+    'Credit',
+)
+EPOCH = date(1970, 1, 1)
+NAT = np.iinfo(np.int64).min
+
+
+class CSVColumns(NamedTuple):
+    """Operations of a CSV export, one array per column.
+
+    Attributes:
+        path (str): Export the columns were read from.
+        date (numpy.ndarray): Booking date of each operation, as datetime64[D].
+        amount (numpy.ndarray): Signed amount of each operation in cents, as int64. Debits are negative.
+        decimals (numpy.ndarray): Number of decimals each amount is written with in the export, as int8.
+        label (numpy.ndarray): Label of each operation, as an array of str objects.
+        short_label (numpy.ndarray): Simplified label of each operation, '' when there is none.
+    """
+
+    path: str
+    date: 'np.ndarray'
+    amount: 'np.ndarray'
+    decimals: 'np.ndarray'
+    label: 'np.ndarray'
+    short_label: 'np.ndarray'
+
+    def __len__(self):
+        return len(self.date)
+
+    def to_arrow(self):
+        """pyarrow Table of the columns, amounts kept in cents."""
+        import pyarrow as pa
+
+        return pa.table(
+            {
+                'date': pa.array(self.date),
+                'amount': pa.array(self.amount),
+                'label': pa.array(self.label, pa.string()),
+                'short_label': pa.array(self.short_label, pa.string()),
+            }
+        )
+
+    def to_parquet(self, path: str, **kwargs):
+        """Write the columns to a Parquet file, kwargs go to pyarrow.parquet.write_table."""
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path, **kwargs)
+
+    def to_entries(
+        self,
+        account: str,
+        expenseCat: str = '',
+        creditCat: str = '',
+        payee_rules: PayeeRules = None,
+    ) -> list:
+        """Beancount transactions of the operations, as CEImporter_CSV.extract builds them."""
+        dates = self.date.tolist()
+        return [
+            operation_transaction(
+                self.path,
+                index,
+                dates[index],
+                label + ' [{}]'.format(short_label) if short_label else label,
+                # the amount keeps the decimals of the export, 24 or 14.9
+                # rather than 24.00 or 14.90
+                Decimal(cents).scaleb(-2).quantize(Decimal(1).scaleb(-places)),
+                account,
+                expenseCat,
+                creditCat,
+                payee_rules,
+            )
+            for (index, (cents, places, label, short_label)) in enumerate(
+                zip(
+                    self.amount.tolist(),
+                    self.decimals.tolist(),
+                    self.label,
+                    self.short_label,
+                )
+            )
+        ]
+
+
+def read_columns(path: str, enforced_date_template: str = '') -> CSVColumns:
+    """Read a CSV export into typed columns.
+
+    Rows are not split one at a time: the whole export is split at once and
+    each column sliced out of the fields, then converted in bulk. Dates are
+    parsed once per distinct value, amounts go to numpy as floats and are
+    rounded to cents. As with CEImporter_CSV, short rows are padded with empty
+    fields and the export ends at the first row without a valid date, such as
+    a balance footer.
+
+    Args:
+        path (str): CSV export of the online banking.
+        enforced_date_template (str, optional): Template of the dates (e.g. '%d/%m/%Y'). Defaults to '', detected from the first row.
+
+    Raises:
+        ValueError: The file is not a CSV export, or an amount is missing.
+    """
+    with open(str(path)) as fd:
+        text = fd.read()
+    (header, _, body) = text.partition('\n')
+    header = [column.strip() for column in header.split(CSV_DELIMITER)]
+    if not set(COLUMNS).issubset(header):
+        raise ValueError('Not a CSV export: {}'.format(path))
+    indexes = [header.index(column) for column in COLUMNS]
+    body = body.rstrip('\n')
+    columns = _split_columns(body, len(header), indexes)
+    if columns is None:
+        columns = _read_columns(body, len(header), indexes)
+    (s_dates, labels, short_labels, debits, credits) = columns
+
+    days = _parse_days(s_dates, enforced_date_template)
+    invalid = np.flatnonzero(days == NAT)
+    count = int(invalid[0]) if len(invalid) else len(days)
+    amounts = [
+        debit or credit
+        for (debit, credit) in zip(debits[:count], credits[:count])
+    ]
+    return CSVColumns(
+        str(path),
+        days[:count].view('datetime64[D]'),
+        _parse_cents(path, amounts),
+        _parse_decimals(amounts),
+        np.array(labels[:count], dtype=object),
+        np.array(short_labels[:count], dtype=object),
+    )
+
+
+def _split_columns(body, width, indexes):
+    # without quotes, every row holds as many fields as the header, and the
+    # fields of a column are evenly spaced in the fields of the whole export
+    if not body or '"' in body:
+        return None
+    fields = body.replace('\n', CSV_DELIMITER).split(CSV_DELIMITER)
+    if len(fields) != (body.count('\n') + 1) * width:
+        # uneven rows, usually a footer: the rows before the first one are
+        # still split at once, the others one by one
+        lines = body.split('\n')
+        even = 0
+        while lines[even].count(CSV_DELIMITER) == width - 1:
+            even += 1
+        fields = (
+            CSV_DELIMITER.join(lines[:even]).split(CSV_DELIMITER)
+            if even
+            else []
+        )
+        for line in lines[even:]:
+            fields.extend(_pad(line.split(CSV_DELIMITER), width))
+    return [fields[index::width] for index in indexes]
+
+
+def _pad(row, width):
+    # missing fields are empty, extra fields dropped
+    return row[:width] + [''] * (width - len(row))
+
+
+def _read_columns(body, width, indexes):
+    # quoted fields go through the csv module
+    reader = csv.reader(StringIO(body), delimiter=CSV_DELIMITER, quotechar='"')
+    getter = itemgetter(*indexes)
+    rows = [getter(_pad(row, width)) for row in reader if row]
+    if not rows:
+        return [[] for _ in indexes]
+    return [list(column) for column in zip(*rows)]
+
+
+def _parse_days(s_dates, enforced_date_template):
+    # exports hold a few hundred distinct dates for thousands of rows
+    if not s_dates:
+        return np.zeros(0, dtype=np.int64)
+    pattern = enforced_date_template or detect_date_pattern(s_dates[0])
+    parse = date_parser(pattern) if pattern else None
+    days = {}
+    for s_date in set(s_dates):
+        try:
+            days[s_date] = (parse(s_date) - EPOCH).days
+        except (TypeError, ValueError):
+            days[s_date] = NAT
+    return np.fromiter(
+        map(days.__getitem__, s_dates), dtype=np.int64, count=len(s_dates)
+    )
+
+
+def _parse_cents(path, amounts):
+    try:
+        try:
+            values = np.fromiter(
+                map(float, amounts), dtype=np.float64, count=len(amounts)
+            )
+        except ValueError:
+            values = np.fromiter(
+                (float(amount.replace(',', '.')) for amount in amounts),
+                dtype=np.float64,
+                count=len(amounts),
+            )
+    except ValueError:
+        raise ValueError('Missing amount in {}'.format(path)) from None
+    return np.rint(values * 100).astype(np.int64)
+
+
+def _parse_decimals(amounts):
+    return np.fromiter(
+        (
+            len(amount.strip().replace(',', '.').partition('.')[2])
+            for amount in amounts
+        ),
+        dtype=np.int8,
+        count=len(amounts),
+    )
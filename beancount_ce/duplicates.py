@@ -0,0 +1,93 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from typing import Iterable
+
+import regex
+from beancount.core import data
+
+DUPLICATE_WINDOW = 3
+# Same value as beancount.ingest.extract.DUPLICATE_META, whose module loads
+# most of beancount when imported.
+DUPLICATE_META = '__duplicate__'
+
+non_word_pattern = regex.compile(r'\W+')
+
+
+@lru_cache(maxsize=4096)
+def normalize_payee(payee) -> str:
+    """Case and punctuation insensitive form of a payee."""
+    return ' '.join(
+        non_word_pattern.sub(' ', (payee or '').casefold()).split()
+    )
+
+
+class DuplicateIndex:
+    """Hashed multiset of the transactions already booked on some accounts.
+
+    Transactions are indexed by account, amount and normalised payee, then by
+    date, so finding an imported transaction in the ledger costs a few
+    dictionary lookups whatever the size of the ledger. Each existing
+    transaction matches at most one imported transaction.
+
+    Attributes:
+        entries (Iterable[data.Directive]): Entries already in the ledger.
+        accounts (Iterable[str]): Accounts whose postings are indexed.
+        window (int, optional): Maximum number of days between an imported transaction and the existing one it duplicates. Defaults to 3.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[data.Directive],
+        accounts: Iterable[str],
+        window: int = DUPLICATE_WINDOW,
+    ):
+        self.accounts = frozenset(accounts)
+        self.window = window
+        self._dates = defaultdict(Counter)
+        for entry in entries or ():
+            key = self._key(entry)
+            if key is not None:
+                self._dates[key][entry.date] += 1
+
+    def __len__(self):
+        return sum(sum(dates.values()) for dates in self._dates.values())
+
+    def _key(self, entry):
+        if not isinstance(entry, data.Transaction):
+            return None
+        for posting in entry.postings:
+            if posting.account in self.accounts and posting.units is not None:
+                return (
+                    posting.account,
+                    posting.units.number,
+                    posting.units.currency,
+                    normalize_payee(entry.payee or entry.narration),
+                )
+        return None
+
+    def pop(self, entry) -> bool:
+        """Remove the existing transaction entry duplicates, if there is one.
+
+        The closest date is preferred, earlier dates first on ties.
+        """
+        key = self._key(entry)
+        dates = self._dates.get(key)
+        if not dates:
+            return False
+        for days in range(self.window + 1):
+            for date in sorted(
+                {entry.date - timedelta(days), entry.date + timedelta(days)}
+            ):
+                if dates[date] > 0:
+                    dates[date] -= 1
+                    return True
+        return False
+
+    def mark(self, entry):
+        """Entry, with its metadata flagged when it is already in the ledger."""
+        if not self.pop(entry):
+            return entry
+        meta = entry.meta.copy()
+        meta[DUPLICATE_META] = True
+        return entry._replace(meta=meta)
@@ -1,49 +1,347 @@
-from pdfminer.high_level import extract_text
-from pdfminer.layout import LAParams
+import time
+from io import StringIO
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple
 
+from .cache import LRUCache, file_digest, file_key, make_key
+from .stats import NULL_STATS
 
-def extractTextStatement(pdf_file):
+# pdfminer takes longer to import than the rest of the package, it is only
+# loaded by the functions laying out a PDF.
+if TYPE_CHECKING:
+    from pdfminer.layout import LAParams
+
+STATEMENT_MARKER = 'www.caisse-epargne.fr'
+# Words printed on the first page of every statement, the marker aside. When
+# none of them shows up there the file is not a statement.
+STATEMENT_HINTS = (
+    "caisse d'epargne",
+    "caisse d'épargne",
+    'caisse-epargne',
+    'ecureuil',
+    'écureuil',
+)
+IDENTIFY_PAGES = 1
+# Word of the balance rows. A trailing page holding one, or a row starting
+# with the date of an operation, is part of the statement and not a notice.
+BALANCE_WORD = 'SOLDE'
+PDF_MAGIC = b'%PDF-'
+PDF_MAGIC_WINDOW = 1024
+# Part of the key of cached texts: bump it whenever a change of the
+# extraction changes the text read with a profile.
+TEXT_VERSION = 1
+
+
+class ExtractionProfile(NamedTuple):
+    """Settings of the pdfminer layout analysis turning a PDF statement into text.
+
+    Attributes:
+        name (str): Name of the profile.
+        word_margin (float): Gap between two characters, relative to their size, read as a space.
+        char_margin (float): Gap between two characters, relative to their size, under which they belong to the same line. Large enough for the date, label and amount of an operation to stay on one line.
+        line_margin (float): Gap between two lines, relative to their height, under which they belong to the same text box.
+        boxes_flow (float, optional): Weight of the horizontal position when ordering text boxes. None keeps the order of the content stream and skips that analysis.
+        page_numbers (Tuple[int, ...], optional): Zero-based numbers of the pages to extract. Defaults to None, every page.
+        maxpages (int): Maximum number of pages to extract. Defaults to 0, no limit.
+        skip_last_pages (int): Maximum number of trailing pages left out when they hold legal and marketing notices, without any operation or balance. The first page is always kept. Defaults to 0.
+        caching (bool): Let pdfminer share fonts and other resources between pages. Defaults to True.
+    """
+
+    name: str = 'default'
+    word_margin: float = 1.0
+    char_margin: float = 120.0
+    line_margin: float = 0.3
+    boxes_flow: Optional[float] = 0.5
+    page_numbers: Optional[Tuple[int, ...]] = None
+    maxpages: int = 0
+    skip_last_pages: int = 0
+    caching: bool = True
+
+    def laparams(self) -> 'LAParams':
+        from pdfminer.layout import LAParams
+
+        return LAParams(
+            word_margin=self.word_margin,
+            char_margin=self.char_margin,
+            line_margin=self.line_margin,
+            boxes_flow=self.boxes_flow,
+        )
+
+
+# Measured with python -m beancount_ce.extract_statement --compare on the test
+# statement laid out over five pages followed by two pages of notices: 'fast'
+# takes 0.7 to 0.8 of the time of 'default' for the same text, 'lean' 0.65 to
+# 0.7 for the same operations but without the last page, read for its
+# characters only to tell it holds no operation. Statements whose operations
+# run onto their last page get the text of 'fast'.
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        ExtractionProfile('default'),
+        ExtractionProfile('fast', boxes_flow=None),
+        ExtractionProfile('lean', boxes_flow=None, skip_last_pages=1),
+        ExtractionProfile('identify', maxpages=IDENTIFY_PAGES),
+    )
+}
+
+
+def get_profile(profile=None) -> ExtractionProfile:
+    """Extraction profile from its name, None standing for the default one."""
+    if profile is None:
+        return PROFILES['default']
+    if isinstance(profile, ExtractionProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('Unknown extraction profile: {!r}'.format(profile))
+
+
+# Text of the statements already extracted in this process, keyed by file
+# path, size and modification time, and extraction profile.
+_text_cache = LRUCache()
+# Outcome of identifyStatement for files that were not fully extracted.
+_identify_cache = LRUCache(maxsize=1024)
+
+
+def clear_text_cache():
+    _text_cache.clear()
+    _identify_cache.clear()
+
+
+def extractTextStatement(
+    pdf_file, disk_cache=None, profile=None, stats=NULL_STATS
+):
+    profile = get_profile(profile)
+    key = (file_key(pdf_file), profile)
+    text = _text_cache.get(key)
+    if text is None:
+        pdf_file = str(pdf_file)
+        if disk_cache is not None and pdf_file.split('.')[-1] == 'pdf':
+            text = _extractTextCached(pdf_file, disk_cache, profile, stats)
+        else:
+            text = _extractText(pdf_file, profile)
+        if text is not None:
+            _text_cache.put(key, text)
+    else:
+        stats.count('text_cache_hits')
+    return text
+
+
+def identifyStatement(pdf_file, disk_cache=None, profile=None) -> bool:
+    """Tell whether a file is a Caisse d'Epargne statement, as cheaply as possible.
+
+    PDF files are checked in increasing order of cost: header bytes, a scan
+    of the raw content for the bank domain, text already cached in memory or
+    on disk, then layout analysis of the first page only. The whole document
+    is laid out only when the first page mentions the bank without its
+    website, or holds no text at all.
+    """
+    profile = get_profile(profile)
+    key = file_key(pdf_file)
+    text = _text_cache.get((key, profile))
+    if text is not None:
+        return STATEMENT_MARKER in text
+    identified = _identify_cache.get(key)
+    if identified is None:
+        identified = _identifyStatement(str(pdf_file), disk_cache, profile)
+        _identify_cache.put(key, identified)
+    return identified
+
+
+def _identifyStatement(pdf_file, disk_cache, profile):
+    if pdf_file.split('.')[-1] != 'pdf':
+        text = extractTextStatement(
+            pdf_file, disk_cache=disk_cache, profile=profile
+        )
+        return text is not None and STATEMENT_MARKER in text
+
+    with open(pdf_file, 'rb') as fd:
+        content = fd.read()
+    if PDF_MAGIC not in content[:PDF_MAGIC_WINDOW]:
+        return False
+    if STATEMENT_MARKER.encode('ascii') in content:
+        return True
+    if disk_cache is not None:
+        blob = disk_cache.get(_textKey(pdf_file, profile))
+        if blob is not None:
+            return STATEMENT_MARKER in blob.decode('utf8')
+
+    first_pages = _extractPdfText(pdf_file, PROFILES['identify'])
+    if STATEMENT_MARKER in first_pages:
+        return True
+    lowered = first_pages.lower()
+    if first_pages.strip() and not any(h in lowered for h in STATEMENT_HINTS):
+        return False
+    text = extractTextStatement(
+        pdf_file, disk_cache=disk_cache, profile=profile
+    )
+    return STATEMENT_MARKER in text
+
+
+def _textKey(pdf_file, profile):
+    # the layout parameters shape the text, so they are part of the key
+    return make_key(
+        'text', file_digest(pdf_file), tuple(profile), TEXT_VERSION
+    )
+
+
+def _extractTextCached(pdf_file, disk_cache, profile, stats=NULL_STATS):
+    key = _textKey(pdf_file, profile)
+    blob = disk_cache.get(key)
+    if blob is not None:
+        stats.count('disk_cache_hits')
+        return blob.decode('utf8')
+    text = _extractText(pdf_file, profile)
+    disk_cache.put(key, text.encode('utf8'))
+    return text
+
+
+def _extractPdfText(pdf_file, profile):
+    from pdfminer.converter import TextConverter
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    resources = PDFResourceManager(caching=profile.caching)
+    with open(pdf_file, 'rb') as fp, StringIO() as output:
+        device = TextConverter(resources, output, laparams=profile.laparams())
+        interpreter = PDFPageInterpreter(resources, device)
+        for page in profile_pages(fp, profile):
+            interpreter.process_page(page)
+        return output.getvalue()
+
+
+def profile_pages(fp, profile):
+    """Pages of an open PDF file selected by an extraction profile."""
+    from pdfminer.pdfpage import PDFPage
+
+    pages = list(
+        PDFPage.get_pages(
+            fp,
+            profile.page_numbers,
+            maxpages=profile.maxpages,
+            caching=profile.caching,
+        )
+    )
+    kept = max(1, len(pages) - profile.skip_last_pages)
+    while len(pages) > kept and _is_notice_page(pages[-1], profile):
+        pages.pop()
+    return pages
+
+
+def _is_notice_page(page, profile):
+    # the characters are enough to tell, without any layout analysis
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+    from .layout_engine import _page_rows, date_word_pattern
+
+    resources = PDFResourceManager(caching=profile.caching)
+    device = PDFPageAggregator(resources, laparams=None)
+    PDFPageInterpreter(resources, device).process_page(page)
+    return not any(
+        date_word_pattern.fullmatch(row.words[0].text)
+        or BALANCE_WORD in row.text
+        for row in _page_rows(0, device.get_result())
+    )
+
+
+def _extractText(pdf_file, profile=None):
     if pdf_file.split('.')[-1] == 'txt':
         with open(pdf_file, 'r') as f:
             data = f.read()
         return str(data)
 
     elif pdf_file.split('.')[-1] == 'pdf':
-        word_margin = 1.0
-        char_margin = 120.0
-        line_margin = 0.3
-        boxes_flow = 0.5  # LAParams
+        return _extractPdfText(pdf_file, get_profile(profile))
+
+
+def compare_profiles(pdf_file, profiles=None, iban='', repeat=3):
+    """Time each extraction profile on a statement and check its outcome.
+
+    Args:
+        pdf_file (str): PDF statement.
+        profiles (Iterable[ExtractionProfile], optional): Profiles compared to the default one. Defaults to every profile but 'identify'.
+        iban (str, optional): Account whose operations are compared. Defaults to '', only the text is compared.
+        repeat (int, optional): Number of extractions timed, the fastest one is kept. Defaults to 3.
+
+    Returns:
+        list: (profile, seconds, same text, same operations) for each profile. Operations are compared only when iban is given, None otherwise.
+    """
+    from .importer_pdf import CEImporter_PDF
 
-        # If any LAParams group arguments were passed, create an LAParams object and
-        # populate with given args. Otherwise, set it to None.
+    if profiles is None:
+        profiles = [p for p in PROFILES.values() if p.name != 'identify']
+    parser = CEImporter_PDF(iban, 'Assets:Statement') if iban else None
 
-        laparams = LAParams()
-        for param in (
-            "word_margin",
-            "char_margin",
-            "line_margin",
-            "boxes_flow",
-        ):
-            paramv = locals().get(param, None)
-            if paramv is not None:
-                setattr(laparams, param, paramv)
+    def operations(text):
+        try:
+            return parser._getOperations(text)
+        except Exception:
+            return None
 
-        text = extract_text(pdf_file=pdf_file, laparams=laparams)
-        return text
+    reference = _extractPdfText(str(pdf_file), get_profile())
+    reference_operations = operations(reference) if parser else None
+    results = []
+    for profile in profiles:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = _extractPdfText(str(pdf_file), profile)
+            timings.append(time.perf_counter() - start)
+        results.append(
+            (
+                profile,
+                min(timings),
+                text == reference,
+                operations(text) == reference_operations if parser else None,
+            )
+        )
+    return results
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Extract the text of a Caisse d\'Epargne PDF statement.'
+    )
+    parser.add_argument('pdf_file')
+    parser.add_argument(
+        '--profile',
+        default='default',
+        choices=sorted(PROFILES),
+        help='extraction profile used to write the text file',
+    )
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='time every profile instead of writing the text file',
+    )
+    parser.add_argument(
+        '--iban', default='', help='account whose operations are compared'
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        results = compare_profiles(args.pdf_file, iban=args.iban)
+        reference = results[0][1]
+        print('profile   seconds  ratio  same text  same operations')
+        for (profile, seconds, same_text, same_ops) in results:
+            print(
+                '{:<9} {:7.3f} {:6.2f}  {:<9}  {}'.format(
+                    profile.name,
+                    seconds,
+                    seconds / reference,
+                    str(same_text),
+                    '-' if same_ops is None else same_ops,
+                )
+            )
+        return
+
+    print('Extract text from ' + args.pdf_file)
+    with open(args.pdf_file[:-4] + '.txt', 'w', encoding='utf8') as text_file:
+        statement = extractTextStatement(args.pdf_file, profile=args.profile)
+        text_file.write(statement)
 
 
 if __name__ == "__main__":
-    import sys
-
-    file_name = ''
-    for arg in sys.argv:
-        if arg[-4:] == '.pdf':
-            file_name = arg
-
-    if len(file_name) > 0:
-        print('Extract text from ' + file_name)
-        with open(file_name[:-4] + '.txt', 'w', encoding='utf8') as text_file:
-            statement = extractTextStatement(str(file_name))
-            text_file.write(statement)
-    else:
-        print('No PDF file found.')
+    main()
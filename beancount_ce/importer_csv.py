@@ -1,36 +1,178 @@
 import csv
-from datetime import datetime
-from typing import Mapping, Tuple
+from datetime import date, datetime
+from functools import lru_cache, partial
+from io import StringIO
+from typing import Callable, Mapping, Tuple, Union
 
-from beancount.core import data
+from beancount.core import data, flags
 from beancount.core.amount import Amount
 from beancount.core.number import Decimal
 from beancount.ingest import importer
 
+from .cache import file_digest
+from .chunked_csv import MappedCSV, iter_lines
+from .duplicates import DuplicateIndex
+from .operation_types import OperationClassifier, operation_classifier
+from .payee_rules import PayeeRules, as_payee_rules
+from .state import ImportState, state_path
+from .stats import ImportStats, new_stats, report_stats
+
 CSV_DELIMITER = ';'
+DATE_COLUMN = 'Date de comptabilisation'
 
 
-def get_date(s_date, pattern: str = ''):
-    date_patterns = [
-        "%Y/%m/%d",
-        '%d/%m/%Y',
-    ]  # '%d-%m-%Y', '%Y-%m-%d', '%m/%d/%Y',
+DATE_PATTERNS = (
+    "%Y/%m/%d",
+    '%d/%m/%Y',
+)  # '%d-%m-%Y', '%Y-%m-%d', '%m/%d/%Y',
+DATE_CACHE_SIZE = 4096
+
+
+def _split_date(s_date: str, year_index: int) -> date:
+    fields = s_date.split('/')
+    if len(fields) != 3 or not all(field.isdigit() for field in fields):
+        raise ValueError('Wrong date format: {!r}'.format(s_date))
+    (day, month) = (fields[2], fields[1]) if year_index == 0 else fields[:2]
+    year = fields[year_index]
+    if len(year) != 4 or len(month) > 2 or len(day) > 2:
+        raise ValueError('Wrong date format: {!r}'.format(s_date))
+    return date(int(year), int(month), int(day))
+
+
+def _parse_ymd(s_date: str) -> date:
+    return _split_date(s_date, 0)
+
+
+def _parse_dmy(s_date: str) -> date:
+    return _split_date(s_date, 2)
+
+
+_fast_date_parsers = {
+    "%Y/%m/%d": _parse_ymd,
+    '%d/%m/%Y': _parse_dmy,
+}
+
+
+@lru_cache(maxsize=None)
+def date_parser(pattern: str):
+    """Memoised function reading dates written with a strptime pattern.
+
+    The slash separated layouts of the bank exports are read by splitting the
+    string instead of going through strptime. The parser raises ValueError on
+    dates not written with the pattern.
+    """
+    parse = _fast_date_parsers.get(pattern)
+    if parse is None:
+
+        def parse(s_date):
+            return datetime.strptime(s_date, pattern).date()
+
+    return lru_cache(maxsize=DATE_CACHE_SIZE)(parse)
+
+
+def detect_date_pattern(s_date: str, patterns=DATE_PATTERNS):
+    """First pattern in patterns able to read s_date, None if there is none."""
+    for pattern in patterns:
+        try:
+            date_parser(pattern)(s_date)
+        except ValueError:
+            continue
+        return pattern
+    return None
+
 
+def get_date(s_date, pattern: str = ''):
+    pattern = pattern or detect_date_pattern(s_date)
     if pattern:
         try:
-            return datetime.strptime(s_date, pattern).date()
-        except:
+            return date_parser(pattern)(s_date)
+        except ValueError:
             pass
-    else:
-        for pattern in date_patterns:
-            try:
-                return datetime.strptime(s_date, pattern).date()
-            except:
-                pass
-
     return None
 
 
+def row_operation(
+    line: Mapping[str, str], classifier: OperationClassifier = None
+) -> Tuple[str, str, str]:
+    """Payee, amount and operation type of a row of a CSV export, as read by csv.DictReader.
+
+    The operation type is read from the label by classifier, '' without one.
+    """
+    payee = line["Libelle operation"]
+    op_type = classifier.classify(payee) if classifier is not None else ''
+    if line["Libelle simplifie"]:
+        payee += f" [{line['Libelle simplifie']}]"
+    amount = line["Debit"] or line["Credit"]
+    return (payee, amount.replace(',', '.'), op_type)
+
+
+def operation_transaction(
+    name: str,
+    index: int,
+    date: date,
+    payee: str,
+    amount: Decimal,
+    account: str,
+    expenseCat: str = '',
+    creditCat: str = '',
+    payee_rules: PayeeRules = None,
+    op_type: str = '',
+) -> data.Transaction:
+    postings = [
+        data.Posting(account, Amount(amount, 'EUR'), None, None, None, None)
+    ]
+    category = expenseCat if amount < 0 else creditCat
+    if payee_rules is not None:
+        category = payee_rules.account(payee) or category
+    if category:
+        postings.append(
+            data.Posting(
+                category, Amount(-amount, 'EUR'), None, None, None, None
+            )
+        )
+    if op_type:
+        payee += ' - ' + op_type
+    return data.Transaction(
+        data.new_metadata(name, index),
+        date,
+        flags.FLAG_OKAY,
+        payee,
+        '',
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        postings,
+    )
+
+
+def extract_chunk(
+    fieldnames, pattern: str, classifier: OperationClassifier, text: str
+):
+    """Operations of a chunk of records of a CSV export.
+
+    Operations are plain tuples, much cheaper than transactions to send back
+    from a worker process.
+
+    Returns:
+        tuple: The (index within the chunk, date, payee, amount text, operation type) of each operation, the number of rows read, and whether the export ends in this chunk, on a row without a valid date.
+    """
+    reader = csv.DictReader(
+        StringIO(text, newline=''),
+        fieldnames=fieldnames,
+        delimiter=CSV_DELIMITER,
+        quoting=csv.QUOTE_MINIMAL,
+        quotechar='"',
+    )
+    parse_date = date_parser(pattern)
+    operations = []
+    for (index, line) in enumerate(reader):
+        try:
+            date = parse_date(line[DATE_COLUMN])
+        except (KeyError, AttributeError, ValueError):
+            return (operations, index, True)
+        operations.append((index, date) + row_operation(line, classifier))
+    return (operations, len(operations), False)
+
+
 class CEImporter_CSV(importer.ImporterProtocol):
     """Beancount Importer for Caisse d'Epargne CSV statement exports.
 
@@ -40,6 +182,13 @@ class CEImporter_CSV(importer.ImporterProtocol):
         creditCat (str, optional): Income category in beancount format (e.g. 'Income:FIXME'). Defaults to '', no income posting added to the operation.
         iban (str, optional): International Bank Account Number of the account you want to extract operations. Note that only the account number is necessary. File will be skipped if account numbers do not match.
         enforced_date_template (str, optional): Enforce the template used to read dates in the CSV statement (e.g. '%Y/%m/%d', '%d/%m/%Y'). Keep default to automatically detect template.
+        state_dir (str, optional): Directory where the exports and the last booking date already imported are recorded. Later runs skip these exports and the rows booked before that date. Defaults to '', every row is imported.
+        on_stats (Callable[[ImportStats], None], optional): Called with the time spent in each stage and the counters of every extracted export. Defaults to None.
+        log_stats (bool, optional): Log these stats as a JSON line on the 'beancount_ce' logger, at INFO level. Defaults to False.
+        workers (int, optional): 0 reads exports line by line. Otherwise exports are memory mapped, decoded with the encoding of their BOM (UTF-8 by default) and cut in chunks of records parsed by this number of processes, None for one per CPU. Defaults to 0.
+        payee_rules (Union[PayeeRules, Mapping[str, str]], optional): Rules picking the counter-posting account from the payee, in place of expenseCat or creditCat. A mapping is read as literal rules, the account of the payees containing each text. Defaults to None.
+        showOperationTypes (bool, optional): Show or not operation type (CARDDEBIT, WIRETRANSFER, CHECK ...) in header, read from the label of the operation. Defaults to False.
+        operation_types (Mapping[str, str], optional): Operation type of the labels starting with each prefix, added to OPERATION_TYPES (e.g. {'PAIEMENT CB': 'CARDDEBIT'}). Defaults to None.
     """
 
     def __init__(
@@ -49,12 +198,39 @@ class CEImporter_CSV(importer.ImporterProtocol):
         creditCat: str = '',
         iban: str = '',
         enforced_date_template: str = '',
+        state_dir: str = '',
+        on_stats: Callable[[ImportStats], None] = None,
+        log_stats: bool = False,
+        workers: int = 0,
+        payee_rules: Union[PayeeRules, Mapping[str, str]] = None,
+        showOperationTypes: bool = False,
+        operation_types: Mapping[str, str] = None,
     ):
         self.account = account
         self.expenseCat = expenseCat
         self.creditCat = creditCat
         self.iban = iban
         self.enforced_date_template = enforced_date_template
+        self.state_dir = state_dir
+        self.on_stats = on_stats
+        self.log_stats = log_stats
+        self.workers = workers
+        self.payee_rules = as_payee_rules(payee_rules)
+        self.showOperationTypes = showOperationTypes
+        self.operation_types = operation_types
+        self.classifier = operation_classifier(operation_types)
+
+    def _getState(self):
+        if not self.state_dir:
+            return None
+        return ImportState(state_path(self.state_dir, self.account))
+
+    def _date_parser(self, s_date: str):
+        """Date parser of a statement, from the enforced template or its first date."""
+        pattern = self.enforced_date_template or detect_date_pattern(s_date)
+        if not pattern:
+            raise ValueError('Wrong date format: {!r}'.format(s_date))
+        return date_parser(pattern)
 
     ## API Methods ##
     #################
@@ -69,22 +245,21 @@ class CEImporter_CSV(importer.ImporterProtocol):
         if not self.identify(file_):
             return None
         date = None
-        with open(file_.name) as fd:
+        with open(file_.name, 'rb') as fd:
             reader = csv.DictReader(
-                fd,
+                iter_lines(fd),
                 delimiter=CSV_DELIMITER,
                 quoting=csv.QUOTE_MINIMAL,
                 quotechar='"',
             )
+            parse_date = None
             for line in reader:
                 try:
-                    date_tmp = get_date(
-                        line["Date de comptabilisation"],
-                        pattern=self.enforced_date_template,
-                    )
-                    if date_tmp is None:
-                        raise RuntimeError("Wrong date format")
-                except Exception as e:
+                    s_date = line["Date de comptabilisation"]
+                    if parse_date is None:
+                        parse_date = self._date_parser(s_date)
+                    date_tmp = parse_date(s_date)
+                except (KeyError, AttributeError, ValueError) as e:
                     print(e)
                     break
                 if not date or date_tmp > date:
@@ -139,83 +314,198 @@ class CEImporter_CSV(importer.ImporterProtocol):
         except:
             return False
 
-    def extract(self, file_, existing_entries=None):
-        entries = []
+    def iter_extract(self, file_, existing_entries=None):
+        """Yield the transactions of a CSV statement one at a time.
 
-        if not self.identify(file_):
-            return []
+        The file is opened once and its header is checked before the first
+        row is parsed, so memory use does not grow with the size of the export.
+        """
+        stats = new_stats(
+            file_.name, self.name(), self.on_stats, self.log_stats
+        )
+        yield from self._iter_extract(file_, existing_entries, stats)
+        report_stats(stats, self.on_stats, self.log_stats)
+
+    def _iter_extract(self, file_, existing_entries, stats):
+        state = self._getState()
+        last_date = None
+        if state is not None:
+            digest = file_digest(file_.name)
+            if state.is_imported(digest):
+                stats.count('already_imported')
+                return
+            last_date = state.last_date
 
-        with open(file_.name) as fd:
+        with open(file_.name, 'rb') as fd:
             reader = csv.DictReader(
-                fd,
+                iter_lines(fd),
                 delimiter=CSV_DELIMITER,
                 quoting=csv.QUOTE_MINIMAL,
                 quotechar='"',
             )
-            for index, line in enumerate(reader):
-                meta = data.new_metadata(file_.name, index)
-                postings = []
-                try:
-                    date = get_date(
-                        line["Date de comptabilisation"],
-                        pattern=self.enforced_date_template,
-                    )
-                    if date is None:
-                        raise RuntimeError("Wrong date format")
-                except:
-                    break
-                amount = (
-                    Decimal(line["Debit"].replace(',', '.'))
-                    if line["Debit"]
-                    else Decimal(line["Credit"].replace(',', '.'))
+            try:
+                header = reader.fieldnames
+            except (UnicodeDecodeError, csv.Error):
+                return
+            if not header or not self.is_valid_header(
+                CSV_DELIMITER.join(header)
+            ):
+                return
+            with stats.stage('duplicates'):
+                duplicates = (
+                    DuplicateIndex(existing_entries, accounts=[self.account])
+                    if existing_entries
+                    else None
                 )
-                postings.append(
-                    data.Posting(
+            (parse_date, index, operations) = (None, -1, 0)
+            classifier = self.classifier if self.showOperationTypes else None
+            # the time spent by the caller between two rows adds up too
+            with stats.stage('rows'):
+                for index, line in enumerate(reader):
+                    try:
+                        s_date = line[DATE_COLUMN]
+                        if parse_date is None:
+                            parse_date = self._date_parser(s_date)
+                            # the parsers are shared by every export
+                            date_hits = parse_date.cache_info().hits
+                        date = parse_date(s_date)
+                    except (KeyError, AttributeError, ValueError):
+                        break
+                    if last_date is not None and date < last_date:
+                        stats.count('skipped')
+                        continue
+                    (payee, amount, op_type) = row_operation(line, classifier)
+                    transaction = operation_transaction(
+                        file_.name,
+                        index,
+                        date,
+                        payee,
+                        Decimal(amount),
                         self.account,
-                        Amount(amount, 'EUR'),
-                        None,
-                        None,
-                        None,
-                        None,
+                        self.expenseCat,
+                        self.creditCat,
+                        self.payee_rules,
+                        op_type,
                     )
+                    if duplicates:
+                        transaction = duplicates.mark(transaction)
+                    operations += 1
+                    yield transaction
+                    if state is not None:
+                        state.record_date(date)
+            stats.count('lines', index + 1)
+            stats.count('operations', operations)
+            if parse_date is not None:
+                stats.count(
+                    'date_cache_hits',
+                    parse_date.cache_info().hits - date_hits,
                 )
-                if amount < 0:
-                    if len(self.expenseCat) > 0:
-                        postings.append(
-                            data.Posting(
-                                self.expenseCat,
-                                Amount(-amount, 'EUR'),
-                                None,
-                                None,
-                                None,
-                                None,
-                            )
-                        )
-                else:
-                    if len(self.creditCat) > 0:
-                        postings.append(
-                            data.Posting(
-                                self.creditCat,
-                                Amount(-amount, 'EUR'),
-                                None,
-                                None,
-                                None,
-                                None,
-                            )
+
+        if state is not None:
+            state.record_statement(digest)
+            state.save()
+
+    def extract(self, file_, existing_entries=None):
+        if self.workers != 0:
+            return self.extract_mapped(file_, existing_entries)
+        return list(self.iter_extract(file_, existing_entries))
+
+    def extract_mapped(self, file_, existing_entries=None):
+        """Transactions of a CSV export, parsed chunk by chunk in worker processes.
+
+        The export is memory mapped and cut on record boundaries, so workers
+        only decode their own chunk, and their transactions are merged in the
+        order of the file.
+        """
+        stats = new_stats(
+            file_.name, self.name(), self.on_stats, self.log_stats
+        )
+        with stats.stage('total'):
+            entries = self._extract_mapped(file_, existing_entries, stats)
+        report_stats(stats, self.on_stats, self.log_stats)
+        return entries
+
+    def _extract_mapped(self, file_, existing_entries, stats):
+        state = self._getState()
+        last_date = None
+        if state is not None:
+            digest = file_digest(file_.name)
+            if state.is_imported(digest):
+                stats.count('already_imported')
+                return []
+            last_date = state.last_date
+
+        mapped = MappedCSV(file_.name)
+        fieldnames = next(
+            csv.reader([mapped.header], delimiter=CSV_DELIMITER), None
+        )
+        if not fieldnames or not self.is_valid_header(mapped.header):
+            return []
+        # the date template is detected once, from the first row
+        first = next(
+            csv.DictReader(
+                StringIO(mapped.head(), newline=''),
+                fieldnames=fieldnames,
+                delimiter=CSV_DELIMITER,
+            ),
+            {},
+        )
+        pattern = self.enforced_date_template or detect_date_pattern(
+            first.get(DATE_COLUMN) or ''
+        )
+
+        chunks = []
+        if pattern:
+            stats.count('chunks', len(mapped.chunks))
+            with stats.stage('chunks'):
+                chunks = mapped.map(
+                    partial(
+                        extract_chunk,
+                        fieldnames,
+                        pattern,
+                        self.classifier if self.showOperationTypes else None,
+                    ),
+                    self.workers,
+                )
+
+        with stats.stage('entries'):
+            entries = []
+            offset = 0
+            for (operations, rows, last) in chunks:
+                for (index, date, payee, amount, op_type) in operations:
+                    if last_date is not None and date < last_date:
+                        stats.count('skipped')
+                        continue
+                    entries.append(
+                        operation_transaction(
+                            file_.name,
+                            offset + index,
+                            date,
+                            payee,
+                            Decimal(amount),
+                            self.account,
+                            self.expenseCat,
+                            self.creditCat,
+                            self.payee_rules,
+                            op_type,
                         )
-                payee = line["Libelle operation"]
-                if line["Libelle simplifie"]:
-                    payee += f" [{line['Libelle simplifie']}]"
-                entries.append(
-                    data.Transaction(
-                        meta,
-                        date,
-                        self.FLAG,
-                        payee,
-                        '',
-                        data.EMPTY_SET,
-                        data.EMPTY_SET,
-                        postings,
                     )
+                offset += rows
+                if last:
+                    break
+        stats.count('lines', offset)
+        stats.count('operations', len(entries))
+
+        if existing_entries:
+            with stats.stage('duplicates'):
+                duplicates = DuplicateIndex(
+                    existing_entries, accounts=[self.account]
                 )
+                entries = [duplicates.mark(entry) for entry in entries]
+
+        if state is not None:
+            for entry in entries:
+                state.record_date(entry.date)
+            state.record_statement(digest)
+            state.save()
         return entries
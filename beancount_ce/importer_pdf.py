@@ -1,13 +1,30 @@
-from datetime import datetime
-import regex
+from datetime import date, datetime
+from itertools import takewhile
+from typing import Callable, Mapping, Union
 
 from beancount.core import data, flags
 from beancount.core.amount import Amount
 from beancount.core.number import Decimal
 from beancount.ingest import importer
 
-from .extract_statement import extractTextStatement
+from .cache import DiskCache, file_digest, make_key
+from .duplicates import DUPLICATE_META, DuplicateIndex
+from .extract_statement import (
+    extractTextStatement,
+    get_profile,
+    identifyStatement,
+)
+from .operation import Operation, dump_operations, load_operations
+from .operation_types import operation_classifier
+from .payee_rules import PayeeRules, as_payee_rules
 from .regex_formatter import *
+from .state import ImportState, state_path
+from .stats import NULL_STATS, ImportStats, logger, new_stats, report_stats
+
+ENGINES = ('text', 'layout')
+# Part of the key of cached operations: bump it whenever a change of the
+# parser changes the operations read from a statement.
+PARSER_VERSION = 3
 
 
 class CEImporter_PDF(importer.ImporterProtocol):
@@ -19,6 +36,17 @@ class CEImporter_PDF(importer.ImporterProtocol):
         expenseCat (str, optional): Expense category in beancount format (e.g. 'Expenses:FIXME'). Defaults to '', no expense posting added to the operation.
         creditCat (str, optional): Income category in beancount format (e.g. 'Income:FIXME'). Defaults to '', no income posting added to the operation.
         showOperationTypes (bool, optional): Show or not operation type (CARDDEBIT, WIRETRANSFER, CHECK ...) in header. Defaults to False.
+        cache_dir (str, optional): Directory where the text extracted from PDF statements is kept between runs. Defaults to '', no persistent cache.
+        fast_identify (bool, optional): Identify statements from their raw content and first page before falling back to the full text. Defaults to True.
+        accounts (Mapping[str, str], optional): Account name in beancount format for each other International Bank Account Number to extract from the same statements. Defaults to None, only 'iban' is extracted.
+        state_dir (str, optional): Directory where the statements already imported are recorded, to skip them on later runs. Defaults to '', every statement is imported.
+        extraction_profile (str, optional): Name of the layout analysis profile used to extract the text of the statements ('default', 'fast' or 'lean'). Defaults to 'default'.
+        engine (str, optional): 'text' parses the text of the statements with regexes, 'layout' reads the columns of each operation from the position of its words in the PDF, statements whose operations are not lined up with their columns are left to the 'text' engine. Text files are always parsed by the 'text' engine. Defaults to 'text'.
+        on_stats (Callable[[ImportStats], None], optional): Called with the time spent in each stage and the counters of every extracted statement. Defaults to None.
+        log_stats (bool, optional): Log these stats as a JSON line on the 'beancount_ce' logger, at INFO level. Defaults to False.
+        payee_rules (Union[PayeeRules, Mapping[str, str]], optional): Rules picking the counter-posting account from the payee, in place of expenseCat or creditCat. A mapping is read as literal rules, the account of the payees containing each text. Defaults to None.
+        operation_types (Mapping[str, str], optional): Operation type of the labels starting with each prefix, added to OPERATION_TYPES (e.g. {'PAIEMENT CB': 'CARDDEBIT'}). Defaults to None.
+        cache_operations (bool, optional): Keep the operations read from each statement in cache_dir, so later runs only build the entries. Cached operations are keyed by the content of the statement, the accounts extracted, the engine, the extraction profile, the operation types and the parser version. Defaults to False.
     """
 
     def __init__(
@@ -28,12 +56,40 @@ class CEImporter_PDF(importer.ImporterProtocol):
         expenseCat: str = '',
         creditCat: str = '',
         showOperationTypes: bool = False,
+        cache_dir: str = '',
+        fast_identify: bool = True,
+        accounts: Mapping[str, str] = None,
+        state_dir: str = '',
+        extraction_profile: str = 'default',
+        engine: str = 'text',
+        on_stats: Callable[[ImportStats], None] = None,
+        log_stats: bool = False,
+        payee_rules: Union[PayeeRules, Mapping[str, str]] = None,
+        operation_types: Mapping[str, str] = None,
+        cache_operations: bool = False,
     ):
         self.iban = iban
         self.account = account
         self.expenseCat = expenseCat
         self.creditCat = creditCat
         self.showOperationTypes = showOperationTypes
+        self.cache_dir = cache_dir
+        self.disk_cache = DiskCache(cache_dir) if cache_dir else None
+        self.fast_identify = fast_identify
+        self.accounts = {iban: account}
+        if accounts:
+            self.accounts.update(accounts)
+        self.state_dir = state_dir
+        self.extraction_profile = get_profile(extraction_profile)
+        if engine not in ENGINES:
+            raise ValueError('Unknown engine: {!r}'.format(engine))
+        self.engine = engine
+        self.on_stats = on_stats
+        self.log_stats = log_stats
+        self.payee_rules = as_payee_rules(payee_rules)
+        self.operation_types = operation_types
+        self.classifier = operation_classifier(operation_types)
+        self.cache_operations = cache_operations
 
     ## API Methods ##
     #################
@@ -47,7 +103,7 @@ class CEImporter_PDF(importer.ImporterProtocol):
     def file_date(self, file_):
         if not self.identify(file_):
             return None
-        text = extractTextStatement(file_.name)
+        text = self._getText(file_)
         return self._searchEmissionDate(text)
 
     def file_name(self, _):
@@ -56,41 +112,164 @@ class CEImporter_PDF(importer.ImporterProtocol):
     def identify(self, file_) -> bool:
         b = False
         try:
-            text = extractTextStatement(file_.name)
-            if 'www.caisse-epargne.fr' in text:
-                b = True
+            if self.fast_identify:
+                b = identifyStatement(
+                    self._getFileName(file_),
+                    disk_cache=self.disk_cache,
+                    profile=self.extraction_profile,
+                )
+            else:
+                text = self._getText(file_)
+                if 'www.caisse-epargne.fr' in text:
+                    b = True
         except:
             pass
         return b
 
     def extract(self, file_, existing_entries=None):
-        entries = []
-
-        if not self.identify(file_):
-            return []
+        stats = new_stats(
+            self._getFileName(file_),
+            self.name(),
+            self.on_stats,
+            self.log_stats,
+        )
+        with stats.stage('total'):
+            entries = self._extract(file_, existing_entries, stats)
+        report_stats(stats, self.on_stats, self.log_stats)
+        return entries
 
-        if type(file_) == str:
-            text = extractTextStatement(file_)
+    def _extract(self, file_, existing_entries, stats):
+        with stats.stage('identify'):
+            if not self.identify(file_):
+                return []
+
+        state = self._getState()
+        if state is not None:
+            digest = file_digest(self._getFileName(file_))
+            if state.is_imported(digest):
+                stats.count('already_imported')
+                return []
+
+        file_name = self._getFileName(file_)
+        if self.cache_operations and self.disk_cache is not None:
+            key = self._operationsKey(file_name)
+            cached = None
+            blob = self.disk_cache.get(key)
+            if blob is not None:
+                try:
+                    cached = load_operations(blob)
+                except (EOFError, ValueError, TypeError):
+                    # corrupted blob, parsed again and overwritten
+                    pass
+            if cached is not None:
+                stats.count('operations_cache_hits')
+                (operations_by_account, emission_date) = cached
+            else:
+                (operations_by_account, emission_date) = self._readOperations(
+                    file_, stats
+                )
+                self.disk_cache.put(
+                    key, dump_operations(operations_by_account, emission_date)
+                )
         else:
-            text = extractTextStatement(file_.name)
+            (operations_by_account, emission_date) = self._readOperations(
+                file_, stats
+            )
+
+        operations = [
+            (account, op)
+            for (account, account_ops) in operations_by_account
+            for op in account_ops
+        ]
+        stats.count('operations', len(operations))
+
+        with stats.stage('entries'):
+            entries = self._build_entries(file_, operations)
 
-        operations = self._getOperations(text)
+        if existing_entries:
+            with stats.stage('duplicates'):
+                duplicates = DuplicateIndex(
+                    existing_entries, accounts=self.accounts.values()
+                )
+                entries = [duplicates.mark(entry) for entry in entries]
+            stats.count(
+                'duplicates',
+                sum(DUPLICATE_META in entry.meta for entry in entries),
+            )
+
+        if state is not None:
+            state.record_statement(digest, emission_date)
+            state.save()
+
+        return entries
+
+    def _readOperations(self, file_, stats):
+        """Operations of each ledger account and emission date of a statement."""
+        file_name = self._getFileName(file_)
+        if self.engine == 'layout' and file_name.split('.')[-1] == 'pdf':
+            from .layout_engine import read_rows
+
+            with stats.stage('extraction'):
+                rows = read_rows(file_name, self.extraction_profile)
+                text = '\n'.join(row.text for row in rows)
+            stats.count('pages', rows[-1].page + 1 if rows else 0)
+            stats.count('lines', len(rows))
+            with stats.stage('layout_scan'):
+                operations_by_account = self._getLayoutOperationsByAccount(
+                    rows
+                )
+            if operations_by_account is None:
+                logger.warning(
+                    '%s: operations not lined up with their columns, '
+                    'read by the text engine',
+                    file_name,
+                )
+                with stats.stage('extraction'):
+                    text = self._getText(file_, stats)
+                operations_by_account = self._getOperationsByAccount(
+                    text, stats
+                )
+        else:
+            with stats.stage('extraction'):
+                text = self._getText(file_, stats)
+            # pdfminer ends each page with a form feed
+            stats.count('pages', text.count('\f'))
+            stats.count('lines', text.count('\n') + 1)
+            operations_by_account = self._getOperationsByAccount(text, stats)
+        return (operations_by_account, self._searchEmissionDate(text))
+
+    def _operationsKey(self, file_name):
+        from . import __version__
+
+        return make_key(
+            'operations',
+            file_digest(file_name),
+            sorted(self.accounts.items()),
+            PARSER_VERSION,
+            __version__,
+            self.engine if file_name.split('.')[-1] == 'pdf' else 'text',
+            tuple(self.extraction_profile),
+            sorted(self.classifier.prefixes.items()),
+            self.classifier.default,
+        )
 
-        for index, op in enumerate(operations):
-            isExpense = len(op[6]) > 0
+    def _build_entries(self, file_, operations):
+        entries = []
+        for index, (account, op) in enumerate(operations):
+            isExpense = op.debit
             if type(file_) == str:
                 meta = data.new_metadata(file_, index)
             else:
                 meta = data.new_metadata(file_.name, index)
 
-            amount = Decimal(op[6]) if isExpense else Decimal(op[5])
+            amount = abs(op.amount)
             currency = 'EUR'
-            payee = op[4]
+            payee = op.payee
             if self.showOperationTypes:
-                payee += ' - ' + op[2]
+                payee += ' - ' + op.op_type
             postings = [
                 data.Posting(
-                    self.account,
+                    account,
                     Amount((-amount if isExpense else amount), currency),
                     None,
                     None,
@@ -98,22 +277,13 @@ class CEImporter_PDF(importer.ImporterProtocol):
                     None,
                 )
             ]
-            if isExpense and len(self.expenseCat) > 0:
+            category = self.expenseCat if isExpense else self.creditCat
+            if self.payee_rules is not None:
+                category = self.payee_rules.account(op.payee) or category
+            if category:
                 postings.append(
                     data.Posting(
-                        self.expenseCat,
-                        Amount((amount if isExpense else -amount), currency),
-                        None,
-                        None,
-                        None,
-                        None,
-                    )
-                )
-
-            if not isExpense and len(self.creditCat) > 0:
-                postings.append(
-                    data.Posting(
-                        self.creditCat,
+                        category,
                         Amount((amount if isExpense else -amount), currency),
                         None,
                         None,
@@ -125,7 +295,7 @@ class CEImporter_PDF(importer.ImporterProtocol):
             entries.append(
                 data.Transaction(
                     meta,
-                    datetime.strptime(op[0], '%d/%m/%Y').date(),
+                    op.date,
                     flags.FLAG_OKAY,
                     payee,
                     '',
@@ -134,123 +304,244 @@ class CEImporter_PDF(importer.ImporterProtocol):
                     postings,
                 )
             )
-
         return entries
 
     ## Utils ##
     ###########
 
+    def _getFileName(self, file_):
+        return file_ if type(file_) == str else file_.name
+
+    def _getText(self, file_, stats=NULL_STATS):
+        return extractTextStatement(
+            self._getFileName(file_),
+            disk_cache=self.disk_cache,
+            profile=self.extraction_profile,
+            stats=stats,
+        )
+
+    def _getState(self):
+        if not self.state_dir:
+            return None
+        return ImportState(state_path(self.state_dir, self.account))
+
+    def _ledgerAccount(self, account_number):
+        for iban, account in self.accounts.items():
+            if account_number in iban.replace(' ', ''):
+                return account
+        return None
+
     def _getOperations(self, parsed_statement):
+        operations = []
+        for (_, account_ops) in self._getOperationsByAccount(parsed_statement):
+            operations.extend(account_ops)
+        return operations
+
+    def _getOperationsByAccount(self, parsed_statement, stats=NULL_STATS):
         # Clean-up statement string
-        statement = regex.sub(
-            one_character_line_regex,
-            'FLAG_DELETE_THIS_LINE',
-            parsed_statement,
-            flags=regex.M,
-        )  # flag lines with one character or less
-        statement = '\n'.join(
-            [
-                s
-                for s in statement.splitlines()
-                if 'FLAG_DELETE_THIS_LINE' not in s
-            ]
-        )  # keep only non-flaged lines
+        with stats.stage('cleaning'):
+            statement = self._clean_statement(parsed_statement)
 
         # Get emission date
-        emission_date = regex.search(emission_date_regex, statement)
+        emission_date = emission_date_pattern.search(statement)
         emission_date = emission_date.group('date').strip()
         emission_date = datetime.strptime(emission_date, '%d/%m/%Y')
 
-        accounts = self._searchAccounts(statement)
-
         operations = []
 
-        for (full, account_number) in reversed(accounts):
-            if account_number.replace(' ', '') in self.iban.replace(' ', ''):
-
-                (statement, _, account) = statement.partition(full)
-
-                # create total for inconsistency check
-                total = Decimal(0.0)
-
-                # clean account to keep only operations
-                account = self._clean_account(account, full)
-                # search all debit operations
-                debit_ops = regex.finditer(debit_regex, account, flags=regex.M)
-                for debit_op in debit_ops:
-                    debitLine = account[debit_op.start() : debit_op.end()]
-                    debitLine = debitLine.split('\n')[0]
-                    debitLineList = debitLine.split(' ')[1:-1]
-                    debitLineCleanList = []
-                    for w in debitLineList:
-                        if w == 'FACT':
-                            break
-                        if len(w) > 0:
-                            debitLineCleanList.append(w)
-                    debitLine = ''
-                    for i, w in enumerate(debitLineCleanList):
-                        debitLine += ('' if i == 0 else ' ') + w
-                    # extract regex groups
-                    op_date = debit_op.group('op_dte').strip()
-                    op_label = debit_op.group('op_lbl').strip()
-                    op_label_extra = debit_op.group('op_lbl_extra').strip()
-                    op_amount = debit_op.group('op_amt').strip()
-                    # convert amount to regular Decimal
-                    op_amount = op_amount.replace(',', '.')
-                    op_amount = op_amount.replace(' ', '')
-                    op_amount = Decimal(op_amount)
-                    # update total
-                    total -= op_amount
-                    # print('debit {0}'.format(op_amount))
-                    operations.append(
-                        self._create_operation_entry(
-                            op_date,
-                            emission_date,
-                            full,
-                            op_label,
-                            debitLine,
-                            op_amount,
-                            True,
-                        )
+        # the statement is split once, and each section goes to the ledger
+        # account of its IBAN
+        with stats.stage('split'):
+            sections = list(self._splitAccounts(statement))
+        stats.count('accounts', len(sections))
+        for (account_number, full, account) in sections:
+            ledger_account = self._ledgerAccount(account_number)
+            if ledger_account is not None:
+                operations.append(
+                    (
+                        ledger_account,
+                        self._getAccountOperations(
+                            account, full, emission_date, stats
+                        ),
                     )
+                )
 
-                # search all credit operations
-                credit_ops = regex.finditer(
-                    credit_regex, account, flags=regex.M
+        return operations
+
+    def _getAccountOperations(
+        self, account, full, emission_date, stats=NULL_STATS
+    ):
+        operations = []
+
+        # create total for inconsistency check
+        total = Decimal(0.0)
+
+        # clean account to keep only operations
+        with stats.stage('cleaning'):
+            account = self._clean_account(account, full)
+        # search all debit operations
+        with stats.stage('debit_scan'):
+            debit_ops = list(iter_debit_matches(account))
+        stats.count('debits', len(debit_ops))
+        for debit_op in debit_ops:
+            debitLine = debit_op.line
+            debitLineList = debitLine.split(' ')[1:-1]
+            debitLineCleanList = []
+            for w in debitLineList:
+                if w == 'FACT':
+                    break
+                if len(w) > 0:
+                    debitLineCleanList.append(w)
+            debitLine = ''
+            for i, w in enumerate(debitLineCleanList):
+                debitLine += ('' if i == 0 else ' ') + w
+            # extract regex groups
+            op_date = debit_op.op_dte.strip()
+            op_label = debit_op.op_lbl.strip()
+            op_amount = debit_op.op_amt.strip()
+            # convert amount to regular Decimal
+            op_amount = op_amount.replace(',', '.')
+            op_amount = op_amount.replace(' ', '')
+            op_amount = Decimal(op_amount)
+            # update total
+            total -= op_amount
+            # print('debit {0}'.format(op_amount))
+            operations.append(
+                self._create_operation_entry(
+                    op_date,
+                    emission_date,
+                    full,
+                    op_label,
+                    debitLine,
+                    op_amount,
+                    True,
                 )
-                for credit_op in credit_ops:
-                    # extract regex groups
-                    op_date = credit_op.group('op_dte').strip()
-                    op_label = credit_op.group('op_lbl').strip()
-                    op_label_extra = credit_op.group('op_lbl_extra').strip()
-                    op_amount = credit_op.group('op_amt').strip()
-
-                    creditLine = account[credit_op.start() : credit_op.end()]
-                    creditLine = creditLine.split('\n')[0]
-                    creditLine = creditLine[len(op_amount) + len(op_date) :]
-
-                    # convert amount to regular Decimal
-                    op_amount = op_amount.replace(',', '.')
-                    op_amount = op_amount.replace(' ', '')
-                    op_amount = Decimal(op_amount)
-                    # update total
-                    total += op_amount
-                    # print('credit {0}'.format(op_amount))
-
-                    operations.append(
-                        self._create_operation_entry(
-                            op_date,
-                            emission_date,
-                            full,
-                            op_label,
-                            creditLine,
-                            op_amount,
-                            False,
-                        )
-                    )
+            )
+
+        # search all credit operations
+        with stats.stage('credit_scan'):
+            credit_ops = list(iter_credit_matches(account))
+        stats.count('credits', len(credit_ops))
+        for credit_op in credit_ops:
+            # extract regex groups
+            op_date = credit_op.op_dte.strip()
+            op_label = credit_op.op_lbl.strip()
+            op_amount = credit_op.op_amt.strip()
+
+            creditLine = credit_op.line
+            creditLine = creditLine[len(op_amount) + len(op_date) :]
+
+            # convert amount to regular Decimal
+            op_amount = op_amount.replace(',', '.')
+            op_amount = op_amount.replace(' ', '')
+            op_amount = Decimal(op_amount)
+            # update total
+            total += op_amount
+            # print('credit {0}'.format(op_amount))
+
+            operations.append(
+                self._create_operation_entry(
+                    op_date,
+                    emission_date,
+                    full,
+                    op_label,
+                    creditLine,
+                    op_amount,
+                    False,
+                )
+            )
 
         return operations
 
+    def _getLayoutOperationsByAccount(self, rows):
+        """Operations of each ledger account, read from the layout of rows.
+
+        None when a row of an account starts with a date but holds no
+        operation in the columns, as with amounts wrapped on the next row or
+        not lined up with the column headers: the text engine reads these.
+        """
+        from .layout_engine import (
+            date_word_pattern,
+            find_columns,
+            parse_operation,
+        )
+
+        statement = '\n'.join(row.text for row in rows)
+        emission_date = self._searchEmissionDate(statement)
+        header_pattern = self._searchAccountPattern(statement)
+
+        sections = []
+        (columns, debits, credits) = (None, None, None)
+        for row in rows:
+            text = row.text
+            header = header_pattern.fullmatch(text)
+            if header:
+                (debits, credits) = ([], [])
+                sections.append(
+                    (
+                        self._ledgerAccount(
+                            non_digit_pattern.sub('', header.group(2))
+                        ),
+                        header.group(1),
+                        debits,
+                        credits,
+                    )
+                )
+                continue
+            columns = find_columns(row) or columns
+            if new_balance_pattern.search(text):
+                # the operations of the account end with its new balance
+                (debits, credits) = (None, None)
+            if debits is None:
+                continue
+            op = parse_operation(row, columns) if columns else None
+            if op is not None:
+                (debits if op.debit else credits).append(op)
+            elif date_word_pattern.fullmatch(row.words[0].text):
+                return None
+
+        # debits come before credits, as with the text engine
+        return [
+            (
+                ledger_account,
+                [
+                    self._create_layout_operation_entry(
+                        op, emission_date, full
+                    )
+                    for op in debits + credits
+                ],
+            )
+            for (ledger_account, full, debits, credits) in sections
+            if ledger_account is not None
+        ]
+
+    def _create_layout_operation_entry(self, op, emission_date, full):
+        op_amount = Decimal(op.op_amt.replace(' ', '').replace(',', '.'))
+        if op.debit:
+            # the label of a debit goes to the extra label, up to its invoice
+            # reference, as with the text engine
+            label_extra = ' '.join(
+                takewhile(lambda w: w != 'FACT', op.op_lbl.split())
+            )
+            return self._create_operation_entry(
+                op.op_dte,
+                emission_date,
+                full,
+                '',
+                label_extra,
+                op_amount,
+                True,
+            )
+        return self._create_operation_entry(
+            op.op_dte,
+            emission_date,
+            full,
+            op.op_lbl,
+            op.op_lbl,
+            op_amount,
+            False,
+        )
+
     def _create_operation_entry(
         self,
         op_date,
@@ -261,125 +552,77 @@ class CEImporter_PDF(importer.ImporterProtocol):
         op_amount,
         debit,
     ):
-        # search the operation type according to its label
-        op_type = self._search_operation_type(op_label)
+        # search the operation type according to its label, debits are only
+        # labelled by their description
+        op_type = self._search_operation_type(op_label or op_label_extra)
 
-        op = [
+        return Operation(
             self._set_operation_year(op_date, statement_emission_date),
             account_number,
             op_type,
             op_label.strip(),
             # op_label_extra.strip().replace('\n','\\'),
             op_label_extra.strip(),
-            # the star '*' operator is like spread '...' in JS
-            *(['', '%.2f' % op_amount] if debit else ['%.2f' % op_amount, '']),
-        ]
-        return op
+            -op_amount if debit else op_amount,
+        )
 
     def _search_operation_type(self, op_label):
-        op_label = op_label.upper()
-        # bank fees, international fees, subscription fee to bouquet, etc.
-        if (op_label.startswith('*')) or (op_label.startswith('INTERETS')):
-            opType = 'BANK'
-        # cash deposits on the account
-        elif op_label.startswith('VERSEMENT'):
-            opType = 'DEPOSIT'
-        # incoming / outcoming wire transfers: salary, p2p, etc.
-        elif (op_label.startswith('VIREMENT')) or (op_label.startswith('VIR')):
-            opType = 'WIRETRANSFER'
-        # check deposits / payments
-        elif (
-            (op_label.startswith('CHEQUE'))
-            or (op_label.startswith('REMISE CHEQUES'))
-            or (op_label.startswith('REMISE CHQ'))
-        ):
-            opType = 'CHECK'
-        # payments made via debit card
-        elif op_label.startswith('CB'):
-            opType = 'CARDDEBIT'
-        # withdrawals
-        elif (op_label.startswith('RETRAIT')) or (
-            op_label.startswith('RET DAB')
-        ):
-            opType = 'WITHDRAWAL'
-        # direct debits
-        elif op_label.startswith('PRLV'):
-            opType = 'DIRECTDEBIT'
-        else:
-            opType = 'OTHER'
-
-        return opType
+        return self.classifier.classify(op_label)
 
     def _set_operation_year(self, emission, statement_emission_date):
-        # fake a leap year
-        emission = datetime.strptime(emission + '00', '%d/%m%y')
-        if emission.month <= statement_emission_date.month:
-            emission = emission.replace(year=statement_emission_date.year)
-        else:
-            emission = emission.replace(year=statement_emission_date.year - 1)
-        return datetime.strftime(emission, '%d/%m/%Y')
+        (day, month) = (int(field) for field in emission.split('/'))
+        if month <= statement_emission_date.month:
+            return date(statement_emission_date.year, month, day)
+        return date(statement_emission_date.year - 1, month, day)
+
+    def _clean_statement(self, statement):
+        return '\n'.join(self._iter_statement_lines(statement))
+
+    def _iter_statement_lines(self, statement):
+        previous_empty = False
+        for start, end in _iter_line_spans(statement):
+            if start == end:
+                # drop runs of several empty lines, keep lone ones
+                next_empty = end < len(statement) and (
+                    end + 1 == len(statement) or statement[end + 1] == '\n'
+                )
+                keep = not (previous_empty or next_empty)
+                previous_empty = True
+            else:
+                # drop lines with one character or only spaces
+                keep = not one_character_line_pattern.fullmatch(
+                    statement, start, end
+                )
+                previous_empty = False
+            if keep:
+                # a line may hold other line boundaries, such as page breaks
+                yield from statement[start : end + 1].splitlines()
 
     def _clean_account(self, account, account_number):
-        # split the text by the 'new_balance_regex' line
-        cleaned = regex.split(new_balance_regex, account, flags=regex.M)
-        # keep the first part (i.e. everything that's before the 'new_balance_regex' line)
-        cleaned = cleaned[0]
-        # flag lines with specific words
-        words_to_remove = [
-            account_number,
-            'Relevé',
-            'vos comptes',
-            'Page',
-            'Débit Crédit',
-            'Détail des opérations',
-            'frais bancaires et cotisations',
-            'SOLDE PRECEDENT AU',
-        ]
-        words_to_remove_regex = (
-            r'^.*\b(' + '|'.join(words_to_remove) + r')\b.*$'
-        )
-        # flag lines longer than 70
-        cleaned = regex.sub(
-            longer_than_70_regex,
-            'FLAG_DELETE_THIS_LINE',
-            cleaned,
-            flags=regex.M,
-        )
-        # flag lines with words to remove
-        cleaned = regex.sub(
-            words_to_remove_regex,
-            'FLAG_DELETE_THIS_LINE',
-            cleaned,
-            flags=regex.M,
-        )
-        # remove trailing spaces
-        cleaned = regex.sub(
-            trailing_spaces_and_tabs_regex, '', cleaned, flags=regex.M
-        )
-        # flag empty lines
-        cleaned = regex.sub(
-            empty_line_regex, 'FLAG_DELETE_THIS_LINE', cleaned, flags=regex.M
-        )
-        # flag lines with less than 2 characters
-        cleaned = regex.sub(
-            smaller_than_2_regex,
-            'FLAG_DELETE_THIS_LINE',
-            cleaned,
-            flags=regex.M,
-        )
-        # keep only non-flaged lines
-        cleaned = '\n'.join(
-            [
-                s
-                for s in cleaned.splitlines()
-                if 'FLAG_DELETE_THIS_LINE' not in s
-            ]
-        )
-        return cleaned
-
-    def _search_account_owner(self, regex_to_use, statement):
+        # keep everything that's before the 'new_balance_regex' line
+        new_balance = new_balance_pattern.search(account)
+        if new_balance:
+            account = account[: new_balance.start()]
+        return '\n'.join(self._iter_account_lines(account, account_number))
+
+    def _iter_account_lines(self, account, account_number):
+        words_to_remove = words_to_remove_pattern(account_number)
+        for start, end in _iter_line_spans(account):
+            # drop lines longer than 70 and lines with specific words
+            if end - start >= 70 or words_to_remove.search(
+                account, start, end
+            ):
+                continue
+            # remove trailing spaces
+            line = account[start:end].rstrip(' \t')
+            # drop empty lines and lines with less than 2 characters
+            if len(line) <= 2 or blank_line_pattern.fullmatch(line):
+                continue
+            yield from (line + '\n').splitlines()
+
+    def _search_account_owner(self, pattern, statement):
         # search for owner to identify multiple accounts
-        account_owner = regex.search(regex_to_use, statement, flags=regex.M)
+        account_owner = pattern.search(statement)
         if not account_owner:
             raise ValueError('No account owner was found.')
         # extract and strip
@@ -387,32 +630,57 @@ class CEImporter_PDF(importer.ImporterProtocol):
         return account_owner
 
     def _searchEmissionDate(self, statement):
-        emission_date = regex.search(emission_date_regex, statement)
+        emission_date = emission_date_pattern.search(statement)
         # extract and strip
         emission_date = emission_date.group('date').strip()
         # parse date
         emission_date = datetime.strptime(emission_date, '%d/%m/%Y')
         return emission_date.date()
 
-    def _searchAccounts(self, statement):
+    def _searchAccountPattern(self, statement):
         # get owner
-        owner = self._search_account_owner(owner_regex_v1, statement)
-
-        account_regex = r'^((?:MR|MME|MLLE) ' + owner + ' - .* - ([^(\n]*))$'
-        accounts = regex.findall(account_regex, statement, flags=regex.M)
+        owner = self._search_account_owner(owner_pattern_v1, statement)
+        pattern = account_pattern(owner)
 
         # no accounts found, try to get owner with other regex
-        if len(accounts) == 0:
-            owner = self._search_account_owner(owner_regex_v2, statement)
-            account_regex = (
-                r'^((?:MR|MME|MLLE) ' + owner + ' - .* - ([^(\n]*))$'
-            )
-            accounts = regex.findall(account_regex, statement, flags=regex.M)
+        if not pattern.search(statement):
+            owner = self._search_account_owner(owner_pattern_v2, statement)
+            pattern = account_pattern(owner)
+
+        return pattern
 
+    def _searchAccountHeaders(self, statement):
+        return list(self._searchAccountPattern(statement).finditer(statement))
+
+    def _searchAccounts(self, statement):
         # cleanup account number for each returned account
         # we use a syntax called 'list comprehension'
         cleaned_accounts = [
-            (full, regex.sub(r'\D', '', account_number))
-            for (full, account_number) in accounts
+            (header.group(1), non_digit_pattern.sub('', header.group(2)))
+            for header in self._searchAccountHeaders(statement)
         ]
         return cleaned_accounts
+
+    def _splitAccounts(self, statement):
+        # each account section runs from its header to the next one, so the
+        # statement is cut once whatever the number of accounts
+        headers = self._searchAccountHeaders(statement)
+        ends = [header.start() for header in headers[1:]] + [len(statement)]
+        for header, end in zip(headers, ends):
+            yield (
+                non_digit_pattern.sub('', header.group(2)),
+                header.group(1),
+                statement[header.end() : end],
+            )
+
+
+def _iter_line_spans(text):
+    # (start, end) of each line, without copying the text
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end < 0:
+            yield start, len(text)
+            return
+        yield start, end
+        start = end + 1
@@ -0,0 +1,179 @@
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import regex
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTContainer
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+from .extract_statement import get_profile, profile_pages
+
+# Words of the header row above the operations of an account, one per column.
+COLUMN_HEADERS = ('Date', 'Débit', 'Crédit')
+# Horizontal tolerance, in points, when lining up a word with a column header.
+COLUMN_TOLERANCE = 8.0
+# Gap between two characters, relative to their height, splitting two words.
+WORD_GAP = 0.2
+# Gap between the thousands and the rest of an amount, relative to its height.
+THOUSANDS_GAP = 0.6
+
+date_word_pattern = regex.compile(r'\d\d/\d\d')
+amount_word_pattern = regex.compile(r'\d{1,3},\d{2}')
+thousands_word_pattern = regex.compile(r'\d{1,3}')
+
+
+class Word(NamedTuple):
+    x0: float
+    x1: float
+    height: float
+    text: str
+
+
+class Row(NamedTuple):
+    """Words of a page sharing a baseline, from left to right.
+
+    Attributes:
+        page (int): Zero-based number of the page among the extracted ones.
+        words (Tuple[Word, ...]): Words of the row, sorted by position.
+    """
+
+    page: int
+    words: Tuple[Word, ...]
+
+    @property
+    def text(self) -> str:
+        return ' '.join(word.text for word in self.words)
+
+
+class Columns(NamedTuple):
+    """Right edge of the date column and edges of the amount columns, in points."""
+
+    date_x1: float
+    debit_x0: float
+    debit_x1: float
+    credit_x0: float
+    credit_x1: float
+
+
+class LayoutOperation(NamedTuple):
+    op_dte: str
+    op_lbl: str
+    op_amt: str
+    debit: bool
+
+
+def read_rows(pdf_file, profile=None) -> List[Row]:
+    """Read the characters of a PDF statement and return its rows in reading order.
+
+    Only the pages, maxpages and caching settings of the profile apply: the
+    characters are grouped in rows and words here, so pdfminer's layout
+    analysis is skipped altogether.
+    """
+    profile = get_profile(profile)
+    resources = PDFResourceManager(caching=profile.caching)
+    device = PDFPageAggregator(resources, laparams=None)
+    interpreter = PDFPageInterpreter(resources, device)
+    rows = []
+    with open(str(pdf_file), 'rb') as fp:
+        for (number, page) in enumerate(profile_pages(fp, profile)):
+            interpreter.process_page(page)
+            rows.extend(_page_rows(number, device.get_result()))
+    return rows
+
+
+def _iter_chars(item) -> Iterator[LTChar]:
+    if isinstance(item, LTChar):
+        yield item
+    elif isinstance(item, LTContainer):
+        for child in item:
+            yield from _iter_chars(child)
+
+
+def _page_rows(number, layout) -> Iterator[Row]:
+    # characters come in content stream order, where a credit amount may be
+    # drawn before its date: they are grouped by baseline from the top of
+    # the page, then sorted from left to right
+    chars = sorted(_iter_chars(layout), key=lambda char: -(char.y0 + char.y1))
+    row = []
+    for char in chars:
+        if row and not _same_row(row[0], char):
+            yield from _row(number, row)
+            row = []
+        row.append(char)
+    yield from _row(number, row)
+
+
+def _same_row(char0, char1) -> bool:
+    overlap = min(char0.y1, char1.y1) - max(char0.y0, char1.y0)
+    return overlap > 0.5 * min(char0.height, char1.height)
+
+
+def _row(number, chars) -> Iterator[Row]:
+    words = tuple(_iter_words(sorted(chars, key=lambda char: char.x0)))
+    if words:
+        yield Row(number, words)
+
+
+def _iter_words(chars) -> Iterator[Word]:
+    text = []
+    for char in chars:
+        glyph = char.get_text()
+        if glyph.isspace():
+            if text:
+                yield Word(x0, x1, height, ''.join(text))
+                text = []
+            continue
+        if text and char.x0 - x1 > WORD_GAP * char.height:
+            yield Word(x0, x1, height, ''.join(text))
+            text = []
+        if not text:
+            (x0, height) = (char.x0, char.height)
+        text.append(glyph)
+        x1 = char.x1
+    if text:
+        yield Word(x0, x1, height, ''.join(text))
+
+
+def find_columns(row: Row) -> Optional[Columns]:
+    """Columns of the operations under a header row, None for any other row."""
+    words = {word.text: word for word in row.words}
+    if not all(header in words for header in COLUMN_HEADERS):
+        return None
+    (date, debit, credit) = (words[header] for header in COLUMN_HEADERS)
+    return Columns(date.x1, debit.x0, debit.x1, credit.x0, credit.x1)
+
+
+def parse_operation(row: Row, columns: Columns) -> Optional[LayoutOperation]:
+    """Operation of a row, from the column of its date and amount.
+
+    A row holds an operation when it starts with a date in the date column and
+    ends with an amount right aligned in the debit or the credit column.
+    """
+    words = row.words
+    if len(words) < 2:
+        return None
+    (date, amount) = (words[0], words[-1])
+    if (
+        date.x0 > columns.date_x1 + COLUMN_TOLERANCE
+        or not date_word_pattern.fullmatch(date.text)
+        or not amount_word_pattern.fullmatch(amount.text)
+    ):
+        return None
+    if abs(amount.x1 - columns.debit_x1) <= COLUMN_TOLERANCE:
+        debit = True
+    elif abs(amount.x1 - columns.credit_x1) <= COLUMN_TOLERANCE:
+        debit = False
+    else:
+        return None
+
+    end = len(words) - 1
+    op_amt = amount.text
+    thousands = words[end - 1]
+    if (
+        end > 1
+        and thousands_word_pattern.fullmatch(thousands.text)
+        and amount.x0 - thousands.x1 < THOUSANDS_GAP * amount.height
+    ):
+        op_amt = thousands.text + ' ' + op_amt
+        end -= 1
+    op_lbl = ' '.join(word.text for word in words[1:end])
+    return LayoutOperation(date.text, op_lbl, op_amt, debit)
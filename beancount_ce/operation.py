@@ -0,0 +1,79 @@
+import marshal
+from datetime import date
+from decimal import Decimal
+from typing import List, NamedTuple, Tuple
+
+
+class Operation(NamedTuple):
+    """Operation read from a PDF statement.
+
+    Attributes:
+        date (date): Booking date of the operation.
+        account (str): Header of the statement section the operation is listed in (e.g. 'MR PRENOM NOM - COMPTE DE DEPOT - N° 12345 12345 12345678901').
+        op_type (str): Operation type (CARDDEBIT, WIRETRANSFER, CHECK ...).
+        label (str): Label the operation type is read from.
+        payee (str): Label shown as payee of the transaction.
+        amount (Decimal): Signed amount of the operation, negative for debits.
+    """
+
+    date: date
+    account: str
+    op_type: str
+    label: str
+    payee: str
+    amount: Decimal
+
+    @property
+    def debit(self) -> bool:
+        return self.amount.is_signed()
+
+
+def dump_operations(
+    operations_by_account: List[Tuple[str, list]], emission_date: date
+) -> bytes:
+    """Compact binary form of the operations of a statement, by ledger account.
+
+    Only builtin types go through marshal: dates as ordinals and amounts as
+    text, so loading them back costs little more than building the records.
+    """
+    records = [
+        (
+            ledger_account,
+            [
+                (
+                    op.date.toordinal(),
+                    op.account,
+                    op.op_type,
+                    op.label,
+                    op.payee,
+                    str(op.amount),
+                )
+                for op in operations
+            ],
+        )
+        for (ledger_account, operations) in operations_by_account
+    ]
+    return marshal.dumps((emission_date.toordinal(), records))
+
+
+def load_operations(blob: bytes) -> Tuple[List[Tuple[str, list]], date]:
+    """Operations by ledger account and emission date of a statement, from their dump_operations form."""
+    (emission_day, records) = marshal.loads(blob)
+    operations_by_account = [
+        (
+            ledger_account,
+            [
+                Operation(
+                    date.fromordinal(day),
+                    account,
+                    op_type,
+                    label,
+                    payee,
+                    Decimal(amount),
+                )
+                for (day, account, op_type, label, payee, amount) in operations
+            ],
+        )
+        for (ledger_account, operations) in records
+    ]
+    return (operations_by_account, date.fromordinal(emission_day))
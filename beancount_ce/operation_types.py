@@ -0,0 +1,94 @@
+from typing import Mapping
+
+DEFAULT_TYPE = 'OTHER'
+# Operation type of the labels starting with each prefix, the longest prefix
+# of a label wins. Extend it with register_operation_type, or per importer
+# with their operation_types argument.
+OPERATION_TYPES = {
+    # bank fees, international fees, subscription fee to bouquet, etc.
+    '*': 'BANK',
+    'INTERETS': 'BANK',
+    # cash deposits on the account
+    'VERSEMENT': 'DEPOSIT',
+    # incoming / outcoming wire transfers: salary, p2p, etc.
+    'VIR': 'WIRETRANSFER',
+    'VIREMENT': 'WIRETRANSFER',
+    # check deposits / payments
+    'CHEQUE': 'CHECK',
+    'REMISE CHEQUES': 'CHECK',
+    'REMISE CHQ': 'CHECK',
+    # payments made via debit card
+    'CB': 'CARDDEBIT',
+    # withdrawals
+    'RETRAIT': 'WITHDRAWAL',
+    'RET DAB': 'WITHDRAWAL',
+    # direct debits
+    'PRLV': 'DIRECTDEBIT',
+}
+
+
+class OperationClassifier:
+    """Operation type of a label, from the longest known prefix it starts with.
+
+    Prefixes are kept in a trie, so a label is classified in a single walk
+    over its first characters whatever the number of prefixes. Matching is
+    case insensitive.
+
+    Attributes:
+        prefixes (Mapping[str, str], optional): Operation type of the labels starting with each prefix. Defaults to OPERATION_TYPES.
+        default (str, optional): Type of the labels without known prefix. Defaults to 'OTHER'.
+    """
+
+    def __init__(
+        self, prefixes: Mapping[str, str] = None, default: str = DEFAULT_TYPE
+    ):
+        self.default = default
+        self.prefixes = {}
+        self._root = {}
+        self._depth = 0
+        for (prefix, op_type) in (
+            OPERATION_TYPES if prefixes is None else prefixes
+        ).items():
+            self.add(prefix, op_type)
+
+    def add(self, prefix: str, op_type: str):
+        """Classify the labels starting with prefix as op_type."""
+        prefix = prefix.upper()
+        self.prefixes[prefix] = op_type
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        # the type of a node is kept under the empty key, no character
+        node[''] = op_type
+        self._depth = max(self._depth, len(prefix))
+
+    def classify(self, label: str) -> str:
+        (node, op_type) = (self._root, self.default)
+        for char in label[: self._depth].upper():
+            node = node.get(char)
+            if node is None:
+                break
+            op_type = node.get('', op_type)
+        return op_type
+
+
+DEFAULT_CLASSIFIER = OperationClassifier()
+
+
+def register_operation_type(prefix: str, op_type: str):
+    """Classify the labels starting with prefix as op_type in every importer.
+
+    Importers already built with operation_types of their own keep their
+    classifier.
+    """
+    OPERATION_TYPES[prefix] = op_type
+    DEFAULT_CLASSIFIER.add(prefix, op_type)
+
+
+def operation_classifier(
+    operation_types: Mapping[str, str] = None,
+) -> OperationClassifier:
+    """Classifier of an importer, the default one extended with operation_types."""
+    if not operation_types:
+        return DEFAULT_CLASSIFIER
+    return OperationClassifier(dict(OPERATION_TYPES, **operation_types))
@@ -0,0 +1,165 @@
+import re
+from collections import deque
+from typing import Mapping, Optional, Union
+
+# Flags of the patterns joined into one, any other flag being set inline for
+# the whole pattern.
+_JOINED_FLAGS = re.compile('', re.IGNORECASE).flags
+
+
+class PayeeRules:
+    """Counter-posting account of a transaction, picked from its payee.
+
+    Literal rules are compiled into an Aho-Corasick automaton and prefix rules
+    into a trie, each walked once over the payee: matching them costs the
+    same with ten rules or ten thousand. The remaining rules are regular
+    expressions joined into a single alternation, tried only when no literal
+    or prefix rule matches. Patterns with groups or inline global flags, which
+    would change meaning once joined, are tried one by one. Matching is case
+    insensitive.
+
+    Prefix rules win over literal rules, which win over patterns. Among
+    prefix or literal rules the longest match wins, among patterns the
+    leftmost one, then the first declared.
+
+    Attributes:
+        contains (Mapping[str, str], optional): Account of the payees containing each text. Defaults to None.
+        prefixes (Mapping[str, str], optional): Account of the payees starting with each text. Defaults to None.
+        patterns (Mapping[str, str], optional): Account of the payees matching each regular expression, anywhere in the payee. Defaults to None.
+
+    Raises:
+        ValueError: A pattern is not a valid regular expression.
+    """
+
+    def __init__(
+        self,
+        contains: Mapping[str, str] = None,
+        prefixes: Mapping[str, str] = None,
+        patterns: Mapping[str, str] = None,
+    ):
+        self.contains = dict(contains or {})
+        self.prefixes = dict(prefixes or {})
+        self.patterns = dict(patterns or {})
+
+        # both automata are lists of states: the transitions of each state
+        # and the account of the longest rule ending there
+        (self._prefix_goto, self._prefix_account) = _trie(self.prefixes)
+        (self._goto, self._account) = _trie(self.contains)
+        self._link_failures()
+
+        self._pattern_accounts = list(self.patterns.values())
+        (joined, self._separate) = ([], [])
+        for (index, pattern) in enumerate(self.patterns):
+            try:
+                compiled = re.compile(pattern, re.IGNORECASE)
+            except re.error as error:
+                raise ValueError(
+                    'Invalid payee rule pattern {!r} for {}: {}'.format(
+                        pattern, self._pattern_accounts[index], error
+                    )
+                ) from None
+            if compiled.groups or compiled.flags != _JOINED_FLAGS:
+                self._separate.append((index, compiled))
+            else:
+                joined.append('(?P<_{}>{})'.format(index, pattern))
+        self._pattern = None
+        if joined:
+            self._pattern = re.compile('|'.join(joined), re.IGNORECASE)
+
+    def __len__(self):
+        return len(self.contains) + len(self.prefixes) + len(self.patterns)
+
+    def _link_failures(self):
+        # breadth first, the failure of a state is the longest proper suffix
+        # of its text that is also a state, and a state without rule of its
+        # own inherits the account of its failure
+        goto = self._goto
+        failure = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for (char, child) in goto[state].items():
+                fallback = failure[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = failure[fallback]
+                failure[child] = goto[fallback].get(char, 0)
+                if self._account[child] is None:
+                    self._account[child] = self._account[failure[child]]
+                queue.append(child)
+        self._failure = failure
+
+    def account(self, payee: str) -> Optional[str]:
+        """Account of the rule matching payee, None when no rule matches."""
+        if not payee:
+            return None
+        text = payee.casefold()
+        return (
+            self._match_prefix(text)
+            or self._match_contains(text)
+            or self._match_pattern(payee)
+        )
+
+    def _match_prefix(self, text):
+        (goto, accounts) = (self._prefix_goto, self._prefix_account)
+        (state, found) = (0, None)
+        for char in text:
+            state = goto[state].get(char)
+            if state is None:
+                break
+            found = accounts[state] or found
+        return found[1] if found else None
+
+    def _match_contains(self, text):
+        (goto, failure, accounts) = (self._goto, self._failure, self._account)
+        if len(goto) == 1:
+            return None
+        (state, found) = (0, None)
+        for char in text:
+            while state and char not in goto[state]:
+                state = failure[state]
+            state = goto[state].get(char, 0)
+            if accounts[state] is not None and (
+                found is None or accounts[state][0] > found[0]
+            ):
+                found = accounts[state]
+        return found[1] if found else None
+
+    def _match_pattern(self, payee):
+        # the leftmost match wins, then the first declared pattern
+        found = None
+        if self._pattern is not None:
+            match = self._pattern.search(payee)
+            if match is not None:
+                found = (match.start(), int(match.lastgroup[1:]))
+        for (index, compiled) in self._separate:
+            match = compiled.search(payee)
+            if match is not None and (
+                found is None or (match.start(), index) < found
+            ):
+                found = (match.start(), index)
+        return self._pattern_accounts[found[1]] if found else None
+
+
+def _trie(rules):
+    goto = [{}]
+    accounts = [None]
+    for (text, account) in rules.items():
+        (state, text) = (0, text.casefold())
+        for char in text:
+            if char not in goto[state]:
+                goto[state][char] = len(goto)
+                goto.append({})
+                accounts.append(None)
+            state = goto[state][char]
+        if accounts[state] is None:
+            accounts[state] = (len(text), account)
+    return (goto, accounts)
+
+
+def as_payee_rules(
+    rules: Union['PayeeRules', Mapping[str, str], None]
+) -> Optional['PayeeRules']:
+    """PayeeRules of an importer argument, a mapping being literal rules."""
+    if rules is None or isinstance(rules, PayeeRules):
+        return rules
+    return PayeeRules(contains=rules)
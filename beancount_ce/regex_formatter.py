@@ -1,3 +1,8 @@
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+
+import regex
+
 # - will match owner
 # prior to march 2019
 owner_regex_v1 = r'Identifiant client\s+(?P<owner>\D*)'
@@ -82,3 +87,175 @@ longer_than_70_regex = r'^(.{70,})$'
 smaller_than_2_regex = r'^.{,2}$'
 empty_line_regex = r'^(\s*)$'
 trailing_spaces_and_tabs_regex = r'[ \t]+$'
+
+
+## Compiled patterns ##
+#######################
+# Compiled once at import time and shared by every importer instance.
+
+owner_pattern_v1 = regex.compile(owner_regex_v1, flags=regex.M)
+owner_pattern_v2 = regex.compile(owner_regex_v2, flags=regex.M)
+emission_date_pattern = regex.compile(emission_date_regex)
+new_balance_pattern = regex.compile(new_balance_regex, flags=regex.M)
+non_digit_pattern = regex.compile(r'\D')
+
+# - line by line equivalents of the clean-up regexes, matched against a
+#   single line with 'fullmatch'
+one_character_line_pattern = regex.compile(r' +|.')
+blank_line_pattern = regex.compile(r'\s*')
+
+# - words flagging the lines of an account section that are not operations
+words_to_remove = (
+    'Relevé',
+    'vos comptes',
+    'Page',
+    'Débit Crédit',
+    'Détail des opérations',
+    'frais bancaires et cotisations',
+    'SOLDE PRECEDENT AU',
+)
+
+
+@lru_cache(maxsize=64)
+def account_pattern(owner):
+    # - will match account headers of the owner
+    #   MR PRENOM NOM - COMPTE DE DEPOT - N° 12345 12345 12345678901
+    return regex.compile(
+        r'^((?:MR|MME|MLLE) ' + regex.escape(owner) + r' - .* - ([^(\n]*))$',
+        flags=regex.M,
+    )
+
+
+@lru_cache(maxsize=64)
+def words_to_remove_pattern(account_number):
+    words = (regex.escape(account_number),) + words_to_remove
+    return regex.compile(r'\b(' + '|'.join(words) + r')\b')
+
+
+## Operation matchers ##
+########################
+# Line by line equivalents of 'debit_regex' and 'credit_regex'. Both regexes
+# look at most one line ahead of the operation they match, so the cleaned
+# account is scanned once, each line being matched by a pattern anchored on
+# that line only. Lines are at most 70 characters long once cleaned, hence a
+# scan linear in the number of lines.
+
+_amount = r'\d{1,3}\s{1}\d{1,3}\,\d{2}|\d{1,3}\,\d{2}'
+_thousands_amount = r'\d{1,3}\s{1}\d{1,3}\,\d{2}'
+
+# debit line holding its amount: '18/10 CB CENTRE LECLERC  FACT 161014  13,40'
+debit_line_pattern = regex.compile(
+    r'^(?P<op_dte>\d\d\/\d\d)(?P<op_lbl>.*?)\s.*?'
+    r'(?P<op_amt>(?<=\s)' + _amount + r')$'
+)
+debit_line_thousands_pattern = regex.compile(
+    r'^(?P<op_dte>\d\d\/\d\d)(?P<op_lbl>.*?)\s.*?'
+    r'(?P<op_amt>(?<=\s)' + _thousands_amount + r')$'
+)
+# amount of a debit wrapped on the line after its date
+debit_next_line_pattern = regex.compile(
+    r'^.*?(?P<op_amt>(?:^|(?<=\s))' + _amount + r')$'
+)
+debit_next_line_thousands_pattern = regex.compile(
+    r'^.*?(?P<op_amt>(?:^|(?<=\s))' + _thousands_amount + r')$'
+)
+credit_line_pattern = regex.compile(
+    r'^(?P<op_amt>' + _amount + r')(?P<op_dte>\d\d\/\d\d)(?P<op_lbl>.*)$'
+)
+
+_date_pattern = regex.compile(r'\d\d\/\d\d')
+_whitespace_start_pattern = regex.compile(r'\s')
+_thousands_start_pattern = regex.compile(_thousands_amount)
+_amount_start_pattern = regex.compile(r'\d{1,3}\,\d{2}')
+# amounts accepted wherever they stand on a line: thousands after a
+# whitespace, or units not ending the line
+_inner_amount_pattern = regex.compile(
+    r'(?:^|(?<=\s))' + _thousands_amount + r'|\d{1,3}\,\d{2}(?!$)'
+)
+_line_end_amount_pattern = regex.compile(r'\d{1,3}\,\d{2}$')
+
+
+class OperationMatch(NamedTuple):
+    op_dte: str
+    op_lbl: str
+    op_amt: str
+    line: str
+
+
+def _rejected_line_end_amounts(lines):
+    # 'debit_regex' refuses an amount ending line i when line i + 1 is
+    # indented and holds a date and an amount, as in
+    #    19/10 INTERETS TAEG 14,40
+    #     VALEUR AU 18/10     4,45
+    # The amount of line i + 1 must itself be accepted, so lines are walked
+    # backwards.
+    rejected = [False] * len(lines)
+    for i in range(len(lines) - 2, -1, -1):
+        line = lines[i + 1]
+        if not _whitespace_start_pattern.match(line):
+            continue
+        rest = line[1:]
+        rejected[i] = bool(_date_pattern.search(rest)) and bool(
+            _inner_amount_pattern.search(rest)
+            or (not rejected[i + 1] and _line_end_amount_pattern.search(rest))
+        )
+    return rejected
+
+
+def _starts_operation(line, line_end_amount_rejected):
+    if _date_pattern.match(line) or _thousands_start_pattern.match(line):
+        return True
+    amount = _amount_start_pattern.match(line)
+    if amount is None:
+        return False
+    return amount.end() < len(line) or not line_end_amount_rejected
+
+
+def iter_debit_matches(account) -> Iterator[OperationMatch]:
+    """Yield the debits matched by 'debit_regex' in a cleaned account."""
+    lines = account.split('\n')
+    rejected = _rejected_line_end_amounts(lines)
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not _date_pattern.match(line):
+            i += 1
+            continue
+        if rejected[i]:
+            match = debit_line_thousands_pattern.match(line)
+        else:
+            match = debit_line_pattern.match(line)
+        if match:
+            op_lbl = match.group('op_lbl')
+            end = i
+        elif i + 1 < len(lines):
+            if rejected[i + 1]:
+                match = debit_next_line_thousands_pattern.match(lines[i + 1])
+            else:
+                match = debit_next_line_pattern.match(lines[i + 1])
+            op_lbl = line[5:]
+            end = i + 1
+        if not match:
+            i += 1
+            continue
+        yield OperationMatch(line[:5], op_lbl, match.group('op_amt'), line)
+
+        # the extra label runs until a line starting with a date or an amount
+        i = end + 1
+        if i < len(lines) and _whitespace_start_pattern.match(lines[i]):
+            i += 1
+        while i < len(lines) and not _starts_operation(lines[i], rejected[i]):
+            i += 1
+
+
+def iter_credit_matches(account) -> Iterator[OperationMatch]:
+    """Yield the credits matched by 'credit_regex' in a cleaned account."""
+    for line in account.split('\n'):
+        match = credit_line_pattern.match(line)
+        if match:
+            yield OperationMatch(
+                match.group('op_dte'),
+                match.group('op_lbl'),
+                match.group('op_amt'),
+                line,
+            )
@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STATE_SUFFIX = '.json'
+LOCK_SUFFIX = '.lock'
+# Calls to msvcrt.locking, each retrying for 10 seconds, before a save gives
+# up on a lock file held by another process.
+LOCK_ATTEMPTS = 6
+
+# Saves of the same state file within a process are serialised, so imports
+# running in threads do not drop each other's statements.
+_save_locks = {}
+_save_locks_lock = threading.Lock()
+
+
+def _save_lock(path: str) -> threading.Lock:
+    with _save_locks_lock:
+        return _save_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on path, held across processes (e.g. batch workers).
+
+    flock waits as long as another process holds the lock, which the system
+    releases when that process ends. On Windows the lock is given up after a
+    minute.
+
+    Raises:
+        TimeoutError: The lock is still held by another process after a minute, on Windows.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+b') as fd:
+        if fcntl is not None:
+            fcntl.flock(fd.fileno(), fcntl.LOCK_EX)
+        else:
+            fd.seek(0)
+            for _ in range(LOCK_ATTEMPTS):
+                try:
+                    msvcrt.locking(fd.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            else:
+                raise TimeoutError(
+                    'Import state lock {} held by another process'.format(path)
+                )
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd.fileno(), fcntl.LOCK_UN)
+            else:
+                fd.seek(0)
+                msvcrt.locking(fd.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def state_path(state_dir: str, account: str) -> str:
+    """File keeping the import state of a beancount account in state_dir."""
+    return os.path.join(
+        os.path.expanduser(os.fspath(state_dir)),
+        account.replace(':', '.') + STATE_SUFFIX,
+    )
+
+
+class ImportState:
+    """Statements and CSV rows of an account imported by previous runs.
+
+    The state is a small JSON file mapping the content hash of every imported
+    statement to its emission date, along with the latest booking date read in
+    CSV exports. Saving merges with the file on disk, so several importers
+    sharing an account do not forget each other's statements.
+
+    Attributes:
+        path (str): JSON file the state is kept in. Created on first save.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statements = {}
+        self.last_date = None
+        self.load()
+
+    def load(self):
+        (self.statements, self.last_date) = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf8') as fd:
+                state = json.load(fd)
+            last_date = state.get('last_date')
+            return (
+                dict(state.get('statements', {})),
+                date(*map(int, last_date.split('-'))) if last_date else None,
+            )
+        except (OSError, ValueError, TypeError, AttributeError):
+            return ({}, None)
+
+    def is_imported(self, digest: str) -> bool:
+        return digest in self.statements
+
+    def record_statement(self, digest: str, emission_date: date = None):
+        self.statements[digest] = (
+            emission_date.isoformat() if emission_date else ''
+        )
+
+    def record_date(self, booking_date: date):
+        if self.last_date is None or booking_date > self.last_date:
+            self.last_date = booking_date
+
+    def save(self):
+        # the file is read, merged and replaced under a lock on a sidecar
+        # file, which the replace leaves in place
+        with _save_lock(self.path), _file_lock(self.path + LOCK_SUFFIX):
+            self._save()
+
+    def _save(self):
+        (statements, last_date) = self._read()
+        statements.update(self.statements)
+        self.statements = statements
+        if last_date is not None:
+            self.record_date(last_date)
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf8') as tmp:
+                json.dump(
+                    {
+                        'statements': self.statements,
+                        'last_date': self.last_date.isoformat()
+                        if self.last_date
+                        else None,
+                    },
+                    tmp,
+                    indent=1,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
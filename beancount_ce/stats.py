@@ -0,0 +1,93 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger('beancount_ce')
+
+
+class ImportStats:
+    """Wall time spent in each stage of a file import, and what went through it.
+
+    Stages are timed with `stage`, which adds up the time of every block
+    sharing a name, and counters (pages, lines, operations, cache hits...)
+    are increased with `count`.
+
+    Attributes:
+        path (str): File being imported.
+        importer (str): Name of the importer reading it.
+    """
+
+    def __init__(self, path: str, importer: str = ''):
+        self.path = path
+        self.importer = importer
+        self.seconds = {}
+        self.counts = Counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds[name] = (
+                self.seconds.get(name, 0.0) + time.perf_counter() - start
+            )
+
+    def count(self, name: str, number: int = 1):
+        self.counts[name] += number
+
+    def as_dict(self) -> dict:
+        return {
+            'path': self.path,
+            'importer': self.importer,
+            'seconds': {
+                name: round(seconds, 6)
+                for (name, seconds) in self.seconds.items()
+            },
+            'counts': dict(self.counts),
+        }
+
+    def log_line(self) -> str:
+        """One line of JSON, easy to grep and parse from the logs of import jobs."""
+        return 'import_stats ' + json.dumps(self.as_dict(), sort_keys=True)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _NullStats:
+    # stands for the stats of an import nobody listens to, at the cost of a
+    # method call per stage
+    _stage = _NullStage()
+
+    def stage(self, name: str):
+        return self._stage
+
+    def count(self, name: str, number: int = 1):
+        pass
+
+
+NULL_STATS = _NullStats()
+
+
+def new_stats(path: str, importer: str, on_stats=None, log_stats=False):
+    """Stats of a new file import, a no-op stand-in when they are not reported."""
+    if on_stats is None and not log_stats:
+        return NULL_STATS
+    return ImportStats(path, importer)
+
+
+def report_stats(stats, on_stats=None, log_stats=False):
+    if stats is NULL_STATS:
+        return
+    if log_stats:
+        logger.info(stats.log_line())
+    if on_stats is not None:
+        on_stats(stats)
@@ -0,0 +1,206 @@
+"""Synthetic Caisse d'Epargne statements and CSV exports of any size."""
+
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+EMISSION_DATE = date(2020, 5, 16)
+OWNER = 'PRENOM NOM'
+OPERATIONS_PER_PAGE = 40
+DEBIT_LABELS = (
+    '* OP DEBIT BANQUE',
+    'CB ACHAT MAGASIN',
+    'CB CENTRE LECLERC  FACT 161014',
+    'PRLV FREE MOBILE',
+    'RETRAIT DAB',
+    'CHEQUE',
+)
+CREDIT_LABELS = (
+    '* OP CREDIT BANQUE',
+    'VIR SEPA ENTRANT',
+    'VIREMENT PAR INTERNET',
+    'REMISE CHEQUES',
+    'VERSEMENT EXPRESS',
+)
+EXTRA_LINES = (
+    "-Réf. donneur d'ordre : 123456789012345678000001",
+    '-Réf. du mandat : GP0011000255443',
+    'REMBOURSEMENT',
+)
+CSV_HEADER = (
+    'Date de comptabilisation;Libelle simplifie;Libelle operation;Reference;'
+    'Informations complementaires;Type operation;Categorie;Sous categorie;'
+    'Debit;Credit;Date operation;Date de valeur;Pointage operation'
+)
+
+
+def account_number(index: int) -> str:
+    """Eleven digits account number of the index-th account of a statement."""
+    return '{:011d}'.format(12345678901 + index)
+
+
+def account_iban(index: int) -> str:
+    """IBAN holding the account number of the index-th account."""
+    return 'FR76 1234 5123 45{} 30'.format(account_number(index))
+
+
+def _amount(rng: random.Random) -> str:
+    cents = rng.randrange(1, 500000 if rng.random() < 0.05 else 100000)
+    (units, cents) = divmod(cents, 100)
+    if units >= 1000:
+        return '{} {:03d},{:02d}'.format(units // 1000, units % 1000, cents)
+    return '{},{:02d}'.format(units, cents)
+
+
+def _page_header(page: int, header: str):
+    return [
+        'Relevé',
+        '',
+        'de vos comptes',
+        '',
+        'au {} - N° 66 Page {} / '.format(
+            EMISSION_DATE.strftime('%d/%m/%Y'), page
+        ),
+        '',
+        header + ' (suite)',
+        '',
+        'Date Débit Crédit',
+        '',
+    ]
+
+
+def statement_text(operations: int, accounts: int = 1, seed: int = 0) -> str:
+    """Text of a PDF statement, as extracted by pdfminer.
+
+    Args:
+        operations (int): Number of operations of each account.
+        accounts (int, optional): Number of accounts of the statement. Defaults to 1.
+        seed (int, optional): Seed of the random labels and amounts. Defaults to 0.
+    """
+    rng = random.Random(seed)
+    first_day = EMISSION_DATE - timedelta(days=29)
+    lines = [
+        'Direct Ecureuil vos comptes 7j / 7',
+        'www.caisse-epargne.fr ',
+        '',
+        'Relevé',
+        '',
+        'de vos comptes',
+        '',
+        'au {} - N° 66 Page 1 / '.format(EMISSION_DATE.strftime('%d/%m/%Y')),
+        '',
+        'MR {}             '.format(OWNER),
+        '',
+        'Identifiant client',
+        '',
+        'SYNTHESE de vos comptes en euros',
+        '',
+    ]
+    page = 1
+    for index in range(accounts):
+        header = 'MR {} - COMPTE {} - N° 12345 12345 {}'.format(
+            OWNER, index, account_number(index)
+        )
+        lines += [
+            header,
+            '',
+            'Date Débit Crédit',
+            '',
+            'Détail des opérations en euros',
+            '',
+            'SOLDE PRECEDENT AU 16/04/20 912,63',
+            '',
+        ]
+        for number in range(operations):
+            if number and number % OPERATIONS_PER_PAGE == 0:
+                page += 1
+                lines += _page_header(page, header)
+            day = (
+                first_day + timedelta(days=number * 29 // operations)
+            ).strftime('%d/%m')
+            if rng.random() < 0.7:
+                lines.append(
+                    '{} {}      {}'.format(
+                        day, rng.choice(DEBIT_LABELS), _amount(rng)
+                    )
+                )
+            else:
+                lines.append(
+                    '{}{} {}     '.format(
+                        _amount(rng), day, rng.choice(CREDIT_LABELS)
+                    )
+                )
+            if rng.random() < 0.2:
+                lines += [''] + rng.sample(EXTRA_LINES, 2) + ['']
+        lines += [
+            '',
+            'frais bancaires et cotisations pour un total de  -42,24€',
+            '',
+            'NOUVEAU SOLDE CREDITEUR AU 16/05/20 '
+            '(en francs : 1 000 000,00) 100 000,00',
+            '',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def csv_text(operations: int, seed: int = 0) -> str:
+    """Text of a CSV export of the online banking."""
+    rng = random.Random(seed)
+    first_day = EMISSION_DATE - timedelta(days=operations // 10)
+    rows = [CSV_HEADER]
+    for number in range(operations):
+        day = first_day + timedelta(days=number // 10)
+        s_date = '{}/{}/{}'.format(day.day, day.month, day.year)
+        amount = _amount(rng).replace(' ', '').replace(',', '.')
+        if rng.random() < 0.7:
+            (label, amounts) = (rng.choice(DEBIT_LABELS), ['-' + amount, ''])
+        else:
+            (label, amounts) = (rng.choice(CREDIT_LABELS), ['', amount])
+        rows.append(
+            ';'.join(
+                [s_date, '', label, '', '', '', '', '']
+                + amounts
+                + [s_date, s_date, '0']
+            )
+        )
+    return '\n'.join(rows)
+
+
+def write_statement(
+    path: str, operations: int, accounts: int = 1, seed: int = 0
+):
+    with open(path, 'w', encoding='utf8') as fd:
+        fd.write(statement_text(operations, accounts, seed))
+
+
+def write_csv(path: str, operations: int, seed: int = 0):
+    with open(path, 'w', encoding='utf8') as fd:
+        fd.write(csv_text(operations, seed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory')
+    parser.add_argument('--operations', type=int, default=1000)
+    parser.add_argument('--accounts', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.directory, exist_ok=True)
+    name = 'statement_{}x{}'.format(args.accounts, args.operations)
+    write_statement(
+        os.path.join(args.directory, name + '.txt'),
+        args.operations,
+        args.accounts,
+        args.seed,
+    )
+    write_csv(
+        os.path.join(args.directory, 'export_{}.csv'.format(args.operations)),
+        args.operations * args.accounts,
+        args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Cold start time of the package, each import timed in a new interpreter.
+
+    python -m benchmarks.import_time
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Dependencies worth loading only when a statement needs them.
+HEAVY_MODULES = ('pdfminer', 'regex', 'beancount.ingest.extract', 'pytest')
+
+_SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+print(' '.join(m for m in {heavy!r} if m in sys.modules))
+'''
+
+
+def import_time(module: str = 'beancount_ce', repeat: int = 5):
+    """Fastest import of module in a fresh interpreter, in seconds.
+
+    Returns:
+        tuple: Seconds, and the heavy modules the import loaded.
+    """
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [
+                sys.executable,
+                '-c',
+                _SCRIPT.format(module=module, heavy=HEAVY_MODULES),
+            ],
+            stdout=subprocess.PIPE,
+            check=True,
+            universal_newlines=True,
+        ).stdout.splitlines()
+        timings.append(float(output[0]))
+    loaded = output[1].split() if len(output) > 1 else []
+    return (min(timings), loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('modules', nargs='*', default=['beancount_ce'])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        (seconds, loaded) = import_time(module, args.repeat)
+        print(
+            '{:<28} {:8.1f} ms  loads: {}'.format(
+                module, seconds * 1000, ', '.join(loaded) or '-'
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
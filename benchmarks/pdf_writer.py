@@ -0,0 +1,78 @@
+"""Minimal PDF writer for the synthetic statements of benchmarks and tests."""
+
+import zlib
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages, font_size=9, compress=True):
+    """Write a PDF where each page is a list of (x, y, text) runs.
+
+    Text is set in Helvetica with the WinAnsi encoding, so pdfminer can lay it
+    out from the standard font metrics. Content streams are deflated unless
+    ``compress`` is false, as in the statements produced by the bank.
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for runs in pages:
+        stream = b''.join(
+            b'BT /F1 %d Tf %.2f %.2f Td (%s) Tj ET\n'
+            % (font_size, x, y, _escape(text).encode('cp1252'))
+            for x, y, text in runs
+        )
+        stream_filter = b''
+        if compress:
+            stream = zlib.compress(stream)
+            stream_filter = b' /Filter /FlateDecode'
+        objects.append(
+            b'<< /Length %d%s >>\nstream\n%s\nendstream'
+            % (len(stream), stream_filter, stream)
+        )
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>'
+            % (len(objects))
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(kids),
+        len(kids),
+    )
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, obj)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1,
+        xref,
+    )
+    with open(path, 'wb') as fd:
+        fd.write(bytes(out))
+
+
+def text_pages(text, lines_per_page=60, left=40, top=800, leading=12):
+    """Lay out each line of a text as one run, lines_per_page lines a page."""
+    lines = text.splitlines()
+    return [
+        [
+            (left, top - leading * index, line)
+            for (index, line) in enumerate(
+                lines[start : start + lines_per_page]
+            )
+            if line.strip()
+        ]
+        for start in range(0, len(lines), lines_per_page)
+    ]
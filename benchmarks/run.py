@@ -0,0 +1,222 @@
+"""Time the PDF and CSV import pipelines on synthetic statements.
+
+Each target is timed on every size of a matrix of operations and accounts,
+the fastest of a few runs is kept and written to a JSON file. Comparing it
+with the results of a previous run flags the regressions:
+
+    python -m benchmarks.run -o bench.json
+    python -m benchmarks.run --compare bench.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from beancount.ingest import cache as ingest_cache
+
+from beancount_ce import CEImporter, CEImporter_CSV, __version__
+from beancount_ce.extract_statement import (
+    clear_text_cache,
+    extractTextStatement,
+)
+
+from .generate import account_iban, statement_text, write_csv
+from .import_time import import_time
+from .pdf_writer import text_pages, write_pdf
+
+# (operations per account, accounts) of each statement.
+DEFAULT_SIZES = ((10, 1), (100, 3), (1000, 5), (10000, 20))
+# pdfminer takes about a second for a hundred pages, larger statements are
+# only timed from their extracted text.
+PDF_MAX_OPERATIONS = 2000
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+# Timings below a millisecond are too noisy to be reported as regressions.
+MIN_SECONDS = 0.001
+ACCOUNT = 'Assets:CE:Compte'
+
+
+def parse_size(size: str):
+    """'OPERATIONSxACCOUNTS', or 'OPERATIONS' for a single account."""
+    (operations, _, accounts) = size.partition('x')
+    return (int(operations), int(accounts or 1))
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _importer(accounts: int, file_type: int = 0) -> CEImporter:
+    return CEImporter(
+        account_iban(0),
+        ACCOUNT + '0',
+        file_type=file_type,
+        expenseCat='Expenses:FIXME',
+        creditCat='Income:FIXME',
+        accounts={
+            account_iban(index): ACCOUNT + str(index)
+            for index in range(1, accounts)
+        },
+    )
+
+
+def _extract(importer, path):
+    # the text kept in memory by the previous run is dropped, so each run
+    # goes through the whole pipeline
+    clear_text_cache()
+    return importer.extract(ingest_cache.get_file(path))
+
+
+def bench_size(directory: str, operations: int, accounts: int, repeat: int):
+    """Seconds spent by each target on a statement of the given size."""
+    name = '{}x{}'.format(operations, accounts)
+    text = statement_text(operations, accounts)
+    txt_path = os.path.join(directory, 'statement_{}.txt'.format(name))
+    with open(txt_path, 'w', encoding='utf8') as fd:
+        fd.write(text)
+    csv_path = os.path.join(directory, 'export_{}.csv'.format(name))
+    write_csv(csv_path, operations * accounts)
+
+    importer = _importer(accounts)
+    parser = importer.pdf_importer
+    results = {}
+
+    if operations * accounts <= PDF_MAX_OPERATIONS:
+        pdf_path = os.path.join(directory, 'statement_{}.pdf'.format(name))
+        write_pdf(pdf_path, text_pages(text))
+
+        def extract_text():
+            clear_text_cache()
+            extractTextStatement(pdf_path)
+
+        results['extractTextStatement'] = best_of(extract_text, repeat)
+
+    statement = parser._clean_statement(text)
+    sections = [
+        (account_number, account)
+        for (account_number, _, account) in parser._splitAccounts(statement)
+    ]
+    results['_clean_account'] = best_of(
+        lambda: [
+            parser._clean_account(account, account_number)
+            for (account_number, account) in sections
+        ],
+        repeat,
+    )
+    results['_getOperations'] = best_of(
+        lambda: parser._getOperations(text), repeat
+    )
+
+    csv_importer = CEImporter_CSV(
+        ACCOUNT + '0', 'Expenses:FIXME', 'Income:FIXME', account_iban(0), ''
+    )
+    results['CEImporter_CSV.extract'] = best_of(
+        lambda: csv_importer.extract(ingest_cache.get_file(csv_path)), repeat
+    )
+    try:
+        from beancount_ce.columnar import read_columns
+    except ImportError:
+        pass
+    else:
+        results['read_columns'] = best_of(
+            lambda: read_columns(csv_path), repeat
+        )
+    results['CEImporter.extract'] = best_of(
+        lambda: _extract(importer, txt_path), repeat
+    )
+    results['CEImporter.extract csv'] = best_of(
+        lambda: _extract(importer, csv_path), repeat
+    )
+    return {name: results}
+
+
+def run(sizes=DEFAULT_SIZES, repeat: int = DEFAULT_REPEAT) -> dict:
+    results = {
+        'startup': {'import beancount_ce': import_time(repeat=repeat)[0]}
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for (operations, accounts) in sizes:
+            results.update(bench_size(directory, operations, accounts, repeat))
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Targets slower than in the baseline by more than tolerance.
+
+    Returns:
+        list: (size, target, baseline seconds, seconds) of each regression.
+    """
+    regressions = []
+    for (size, targets) in results['results'].items():
+        for (target, seconds) in targets.items():
+            reference = baseline['results'].get(size, {}).get(target)
+            if (
+                reference
+                and seconds > MIN_SECONDS
+                and seconds > reference * (1 + tolerance)
+            ):
+                regressions.append((size, target, reference, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Time the import of synthetic Caisse d\'Epargne statements.'
+    )
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        type=parse_size,
+        default=DEFAULT_SIZES,
+        help='OPERATIONSxACCOUNTS of each statement, e.g. 100000x1',
+    )
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('-o', '--output', help='JSON file of the results')
+    parser.add_argument('--compare', help='JSON results of a previous run')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='slowdown ratio reported as a regression',
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat)
+    for (size, targets) in results['results'].items():
+        for (target, seconds) in targets.items():
+            print('{:<12} {:<24} {:10.4f}s'.format(size, target, seconds))
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as fd:
+            json.dump(results, fd, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding='utf8') as fd:
+            baseline = json.load(fd)
+        regressions = compare(results, baseline, args.tolerance)
+        for (size, target, reference, seconds) in regressions:
+            print(
+                'REGRESSION {} {}: {:.4f}s -> {:.4f}s (x{:.2f})'.format(
+                    size, target, reference, seconds, seconds / reference
+                )
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
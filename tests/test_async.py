@@ -0,0 +1,76 @@
+import asyncio
+import pathlib
+import time
+
+import pytest
+from beancount.ingest import cache
+
+from beancount_ce import CEImporter, extract_statement
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+@pytest.fixture
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def files():
+    return [
+        cache.get_file(str(TESTS_DIR / name))
+        for name in (
+            'test_pdf_importer_statement.txt',
+            'test_csv_importer_statement.csv',
+        )
+    ]
+
+
+def _summary(entries):
+    return [(entry.date, entry.payee, entry.postings) for entry in entries]
+
+
+def test_async_matches_sync(run, files):
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+
+    async def extract_all():
+        return await asyncio.gather(
+            *(importer.aextract(file_) for file_ in files),
+            *(importer.aidentify(file_) for file_ in files),
+            *(importer.afile_date(file_) for file_ in files),
+        )
+
+    (pdf, csv, *rest) = run(extract_all())
+    assert rest == [True, True] + [importer.file_date(f) for f in files]
+    assert _summary(pdf) == _summary(importer.extract(files[0]))
+    assert _summary(csv) == _summary(importer.extract(files[1]))
+
+
+def test_extraction_does_not_block_loop(run, files, monkeypatch):
+    extract_text = extract_statement._extractText
+
+    def slow_extract_text(pdf_file, profile=None):
+        time.sleep(0.2)
+        return extract_text(pdf_file, profile)
+
+    extract_statement.clear_text_cache()
+    monkeypatch.setattr(extract_statement, '_extractText', slow_extract_text)
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE', file_type=1)
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    async def extract():
+        ticker = asyncio.ensure_future(tick())
+        entries = await importer.aextract(files[0])
+        ticker.cancel()
+        return entries
+
+    assert run(extract())
+    assert len(ticks) > 5
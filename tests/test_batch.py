@@ -0,0 +1,95 @@
+import pathlib
+import shutil
+
+import pytest
+
+from beancount_ce import CEImporter
+from beancount_ce.batch import find_statements, main
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+@pytest.fixture
+def statements_dir(tmp_path):
+    for name in ('b_statement.txt', 'a_statement.txt'):
+        shutil.copy(
+            str(TESTS_DIR / 'test_pdf_importer_statement.txt'),
+            str(tmp_path / name),
+        )
+    shutil.copy(
+        str(TESTS_DIR / 'test_csv_importer_statement.csv'),
+        str(tmp_path / 'c_statement.csv'),
+    )
+    (tmp_path / 'notes.md').write_text('Nothing to import')
+    return tmp_path
+
+
+def test_find_statements(statements_dir):
+    assert [
+        pathlib.Path(path).name
+        for path in find_statements(str(statements_dir / '*.txt'))
+    ] == ['a_statement.txt', 'b_statement.txt']
+    assert len(find_statements(str(statements_dir))) == 4
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_extract_batch(statements_dir, max_workers):
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+    results = importer.extract_batch(
+        str(statements_dir), max_workers=max_workers
+    )
+
+    assert [pathlib.Path(path).name for (path, _) in results] == [
+        'a_statement.txt',
+        'b_statement.txt',
+        'c_statement.csv',
+    ]
+    with open(str(statements_dir / 'a_statement.txt')) as fd:
+        expected = importer.extract(fd)
+    for (_, entries) in results[:2]:
+        assert [(e.date, e.narration, e.postings) for e in entries] == [
+            (e.date, e.narration, e.postings) for e in expected
+        ]
+    assert len(results[2][1]) > 0
+
+
+class PickleCounter:
+    # existing entry counting how many times the parent pickles it
+    pickled = 0
+
+    def __getstate__(self):
+        PickleCounter.pickled += 1
+        return {}
+
+
+def test_extract_batch_sends_ledger_once_per_worker(statements_dir):
+    for number in range(8):
+        shutil.copy(
+            str(TESTS_DIR / 'test_pdf_importer_statement.txt'),
+            str(statements_dir / 'statement_{}.txt'.format(number)),
+        )
+    PickleCounter.pickled = 0
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+    results = importer.extract_batch(
+        str(statements_dir), max_workers=2, existing_entries=[PickleCounter()]
+    )
+    assert len(results) == 11
+    assert PickleCounter.pickled <= 2
+
+
+def test_batch_cli(statements_dir, capsys):
+    main(
+        [
+            str(statements_dir / '*.txt'),
+            '--iban',
+            TEST_ACCOUNT_NUMBER,
+            '--account',
+            'Assets:CE',
+            '--file-type',
+            '1',
+        ]
+    )
+    out = capsys.readouterr().out
+    assert out.count('**** ') == 2
+    assert 'Assets:CE' in out
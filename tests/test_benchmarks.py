@@ -0,0 +1,38 @@
+import pytest
+
+from beancount_ce import CEImporter
+from benchmarks.generate import account_iban, csv_text, statement_text
+from benchmarks.run import compare, parse_size
+
+
+@pytest.mark.parametrize('operations, accounts', [(1, 1), (95, 3)])
+def test_statement_text(operations, accounts):
+    importer = CEImporter(
+        account_iban(0),
+        'Assets:CE:0',
+        file_type=1,
+        accounts={account_iban(i): 'Assets:CE:%d' % i for i in range(1, 3)},
+    )
+    by_account = importer.pdf_importer._getOperationsByAccount(
+        statement_text(operations, accounts)
+    )
+    assert [account for (account, _) in by_account] == [
+        'Assets:CE:%d' % i for i in range(accounts)
+    ]
+    assert all(len(ops) == operations for (_, ops) in by_account)
+
+
+def test_csv_text(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_text(csv_text(42), encoding='utf8')
+    importer = CEImporter(account_iban(0), 'Assets:CE:0', file_type=2)
+    with path.open() as fd:
+        assert len(importer.csv_importer.extract(fd)) == 42
+
+
+def test_compare():
+    baseline = {'results': {'10x1': {'a': 1.0, 'b': 1.0, 'c': 0.0001}}}
+    results = {'results': {'10x1': {'a': 1.1, 'b': 2.0, 'c': 0.0005}}}
+    assert parse_size('10') == (10, 1)
+    assert parse_size('10x3') == (10, 3)
+    assert compare(results, baseline, 0.25) == [('10x1', 'b', 1.0, 2.0)]
@@ -0,0 +1,153 @@
+import datetime
+import logging
+import os
+import pathlib
+
+from beancount.ingest import cache as ingest_cache
+
+from beancount_ce import CEImporter, extract_statement, importer_pdf
+from beancount_ce.cache import DiskCache, LRUCache
+from beancount_ce.operation import dump_operations, load_operations
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+
+
+def test_disk_cache_roundtrip_and_prune(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=4096)
+    cache.put('first', b'x' * 10)
+    assert cache.get('first') == b'x' * 10
+    assert cache.get('missing') is None
+
+    # incompressible blobs overflowing the cap evict the oldest entries
+    os.utime(str(tmp_path / 'first.z'), ns=(0, 0))
+    for index in range(3):
+        cache.put('blob%d' % index, os.urandom(2000))
+    assert cache.get('first') is None
+    assert cache.get('blob2') is not None
+    assert sum(f.stat().st_size for f in tmp_path.iterdir()) <= 4096
+
+
+def test_pdf_text_persisted_between_runs(tmp_path, monkeypatch):
+    pdf_file = tmp_path / 'statement.pdf'
+    pdf_file.write_bytes(b'%PDF-1.4 fake statement')
+    calls = []
+
+    def fake_extract_text(path, profile=None):
+        calls.append(path)
+        return 'www.caisse-epargne.fr'
+
+    monkeypatch.setattr(extract_statement, '_extractText', fake_extract_text)
+    disk_cache = DiskCache(str(tmp_path / 'cache'))
+    for _ in range(2):
+        extract_statement.clear_text_cache()
+        text = extract_statement.extractTextStatement(
+            str(pdf_file), disk_cache=disk_cache
+        )
+        assert text == 'www.caisse-epargne.fr'
+
+    assert calls == [str(pdf_file)]
+
+
+def test_operations_roundtrip():
+    statement = TESTS_DIR / 'test_pdf_importer_statement.txt'
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE', file_type=1)
+    with open(str(statement)) as fd:
+        text = fd.read()
+    operations_by_account = importer.pdf_importer._getOperationsByAccount(text)
+    emission_date = datetime.date(2020, 5, 16)
+    assert load_operations(
+        dump_operations(operations_by_account, emission_date)
+    ) == (operations_by_account, emission_date)
+
+
+def test_operations_persisted_between_runs(tmp_path, monkeypatch):
+    statement = ingest_cache.get_file(
+        str(TESTS_DIR / 'test_pdf_importer_statement.txt')
+    )
+    stats = []
+
+    def extract(**kwargs):
+        importer = CEImporter(
+            TEST_ACCOUNT_NUMBER,
+            'Assets:CE',
+            file_type=1,
+            cache_dir=str(tmp_path / 'cache'),
+            cache_operations=True,
+            on_stats=stats.append,
+            **kwargs
+        )
+        return importer.extract(statement)
+
+    entries = extract()
+    assert extract() == entries
+    assert [s.counts['operations_cache_hits'] for s in stats] == [0, 1]
+    assert 'cleaning' not in stats[1].seconds
+
+    # corrupted blobs are parsed again
+    disk_cache = DiskCache(str(tmp_path / 'cache'))
+    for name in os.listdir(disk_cache.directory):
+        disk_cache.put(name[: -len('.z')], b'\xff')
+    assert extract() == entries
+    assert stats[2].counts['operations_cache_hits'] == 0
+    assert extract() == entries
+    del stats[2:]
+
+    # the key changes with the accounts, the operation types and the parser
+    extract(accounts={'FR76 0000': 'Assets:Other'})
+    extract(operation_types={'OP': 'BANK'})
+    monkeypatch.setattr(importer_pdf, 'PARSER_VERSION', -1)
+    extract()
+    assert [s.counts['operations_cache_hits'] for s in stats[2:]] == [0, 0, 0]
+
+
+def test_unwritable_cache_dir(tmp_path, caplog):
+    statement = ingest_cache.get_file(
+        str(TESTS_DIR / 'test_pdf_importer_statement.txt')
+    )
+    # a file in place of the directory fails every write, even as root
+    cache_dir = tmp_path / 'cache'
+    cache_dir.write_bytes(b'')
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER,
+        'Assets:CE',
+        file_type=1,
+        cache_dir=str(cache_dir),
+        cache_operations=True,
+    )
+    expected = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE', file_type=1)
+
+    with caplog.at_level(logging.WARNING, logger='beancount_ce'):
+        assert importer.extract(statement) == expected.extract(statement)
+    assert caplog.records
+    assert all('not updated' in r.getMessage() for r in caplog.records)
+
+
+def test_unwritable_cache_dir_identifies_pdf(tmp_path, monkeypatch):
+    pdf_file = tmp_path / 'statement.pdf'
+    pdf_file.write_bytes(b'%PDF-1.4 fake statement')
+    monkeypatch.setattr(
+        extract_statement,
+        '_extractText',
+        lambda path, profile=None: 'www.caisse-epargne.fr',
+    )
+    monkeypatch.setattr(
+        extract_statement, '_extractPdfText', lambda path, profile: ''
+    )
+    cache_dir = tmp_path / 'cache'
+    cache_dir.write_bytes(b'')
+    extract_statement.clear_text_cache()
+
+    assert extract_statement.identifyStatement(
+        str(pdf_file), disk_cache=DiskCache(str(cache_dir))
+    )
@@ -0,0 +1,137 @@
+import codecs
+import pathlib
+
+import pytest
+from beancount.ingest import cache
+
+from beancount_ce import CEImporter, CEImporter_CSV, chunked_csv
+from beancount_ce.chunked_csv import MappedCSV, detect_encoding, record_bounds
+from benchmarks.generate import csv_text
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+
+
+def _summary(entries):
+    return [
+        (entry.meta['lineno'], entry.date, entry.payee, entry.postings)
+        for entry in entries
+    ]
+
+
+def _importer(**kwargs):
+    return CEImporter_CSV(
+        'Assets:CE', 'Expenses:FIXME', 'Income:FIXME', **kwargs
+    )
+
+
+def test_detect_encoding():
+    assert detect_encoding(codecs.BOM_UTF8 + b'Date') == ('utf-8', 3)
+    assert detect_encoding(codecs.BOM_UTF16_LE + b'D\0') == ('utf-16-le', 2)
+    assert detect_encoding('Libellé'.encode('utf8')) == ('utf-8', 0)
+    assert detect_encoding('Libellé'.encode('utf8')[:-1]) == ('utf-8', 0)
+    assert detect_encoding('Libellé;'.encode('cp1252')) == ('cp1252', 0)
+
+
+def test_record_bounds_respect_quotes():
+    buffer = b'a;"x\n;y";1\nb;"""z""\n";2\nc;d;3\n'
+    bounds = record_bounds(buffer, 0, chunk_size=1)
+    assert [buffer[start:end] for (start, end) in bounds] == [
+        b'a;"x\n;y";1\n',
+        b'b;"""z""\n";2\n',
+        b'c;d;3\n',
+    ]
+
+
+def _write_export(path, operations, bom=b''):
+    lines = csv_text(operations).split('\n')
+    # a quoted label with a line break and a delimiter
+    lines[7] = lines[7].replace(';CHEQUE;', ';"CHEQUE\nN° 1; 2";', 1)
+    path.write_bytes(bom + '\r\n'.join(lines).encode('utf8'))
+    return cache.get_file(str(path))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_mapped_matches_stream(tmp_path, monkeypatch, workers):
+    monkeypatch.setattr(chunked_csv, 'CHUNK_SIZE', 2000)
+    export = _write_export(tmp_path / 'export.csv', 500, codecs.BOM_UTF8)
+    assert len(MappedCSV(export.name).chunks) > 10
+
+    entries = _importer(workers=workers).extract(export)
+    assert len(entries) == 500
+    # the stream reader does not skip the BOM
+    expected = _importer().extract(_write_export(tmp_path / 'stream.csv', 500))
+    assert [(entry.meta['lineno'], entry.date) for entry in entries] == [
+        (entry.meta['lineno'], entry.date) for entry in expected
+    ]
+    assert [(entry.payee, entry.postings) for entry in entries] == [
+        (entry.payee, entry.postings) for entry in expected
+    ]
+
+
+def test_mapped_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(chunked_csv, 'CHUNK_SIZE', 2000)
+    export = _write_export(tmp_path / 'export.csv', 200)
+    state_dir = str(tmp_path / 'state')
+    assert (
+        len(_importer(workers=1, state_dir=state_dir).extract(export)) == 200
+    )
+    assert _importer(workers=1, state_dir=state_dir).extract(export) == []
+
+
+def test_mapped_test_export():
+    path = str(TESTS_DIR / 'test_csv_importer_statement.csv')
+    assert _summary(_importer(workers=1).extract(cache.get_file(path))) == (
+        _summary(_importer().extract(cache.get_file(path)))
+    )
+
+
+def test_mapped_cp1252_export(tmp_path):
+    lines = csv_text(20).split('\n')
+    fields = lines[3].split(';')
+    fields[2] = 'CHÈQUE'
+    lines[3] = ';'.join(fields)
+    path = tmp_path / 'export.csv'
+    path.write_bytes('\n'.join(lines).encode('cp1252'))
+    mapped = MappedCSV(str(path))
+    assert mapped.encoding == 'cp1252'
+    entries = _importer(workers=1).extract(cache.get_file(str(path)))
+    assert len(entries) == 20
+    assert any('CHÈQUE' in entry.payee for entry in entries)
+
+
+def _cp1252_after_head(path, last_label):
+    lines = csv_text(2000).split('\n')
+    assert len('\n'.join(lines[:-1])) > chunked_csv.HEAD_SIZE
+    fields = lines[-1].split(';')
+    fields[2] = last_label
+    lines[-1] = ';'.join(fields)
+    path.write_bytes('\n'.join(lines).encode('cp1252', 'replace'))
+    return cache.get_file(str(path))
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_cp1252_after_head(tmp_path, workers):
+    export = _cp1252_after_head(tmp_path / 'export.csv', 'CHÈQUE')
+    assert MappedCSV(export.name).encoding == 'utf-8'
+    entries = _importer(workers=workers).extract(export)
+    assert len(entries) == 2000
+    assert 'CHÈQUE' in entries[-1].payee
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_undecodable_after_head(tmp_path, workers):
+    export = _cp1252_after_head(tmp_path / 'export.csv', 'CHÈQUE')
+    # 0x81 is neither UTF-8 nor cp1252
+    data = pathlib.Path(export.name).read_bytes()
+    pathlib.Path(export.name).write_bytes(data.replace(b'\xc8', b'\x81'))
+    with pytest.raises(UnicodeDecodeError):
+        _importer(workers=workers).extract(export)
+
+
+def test_ce_importer_csv_workers(tmp_path):
+    export = _write_export(tmp_path / 'export.csv', 50, codecs.BOM_UTF8)
+    importer = CEImporter(
+        'FR76 1234 5123 4512345678901 30', 'Assets:CE', 2, csv_workers=1
+    )
+    assert importer.csv_importer.workers == 1
+    assert len(importer.extract(export)) == 50
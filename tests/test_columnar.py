@@ -0,0 +1,102 @@
+import pathlib
+
+import pytest
+from beancount.ingest import cache
+from beancount.parser import printer
+
+from beancount_ce import CEImporter_CSV
+
+np = pytest.importorskip('numpy')
+columnar = pytest.importorskip('beancount_ce.columnar')
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_FILE = str(TESTS_DIR / 'test_csv_importer_statement.csv')
+
+
+def _summary(entries):
+    return [(entry.date, entry.payee, entry.postings) for entry in entries]
+
+
+def test_read_columns():
+    columns = columnar.read_columns(TEST_FILE)
+    assert len(columns) == 7
+    assert columns.date.dtype == np.dtype('datetime64[D]')
+    assert columns.date[0] == np.datetime64('2020-04-17')
+    assert columns.amount.dtype == np.int64
+    assert columns.amount[:3].tolist() == [-1490, 440, 2400]
+    assert columns.label[0] == '* OP DEBIT BANQUE'
+    assert columns.short_label[:3].tolist() == ['Deb', 'Cre', '']
+
+
+def test_entries_match_importer():
+    importer = CEImporter_CSV('Assets:CE', 'Expenses:FIXME', 'Income:FIXME')
+    entries = columnar.read_columns(TEST_FILE).to_entries(
+        'Assets:CE', 'Expenses:FIXME', 'Income:FIXME'
+    )
+    assert _summary(entries) == _summary(
+        importer.extract(cache.get_file(TEST_FILE))
+    )
+
+
+def test_entries_identical_to_importer():
+    importer = CEImporter_CSV('Assets:CE', 'Expenses:FIXME', 'Income:FIXME')
+    entries = columnar.read_columns(TEST_FILE).to_entries(
+        'Assets:CE', 'Expenses:FIXME', 'Income:FIXME'
+    )
+    expected = importer.extract(cache.get_file(TEST_FILE))
+    assert entries == expected
+    # equal decimals may still print differently, 14.9 and 14.90
+    assert [printer.format_entry(entry) for entry in entries] == [
+        printer.format_entry(entry) for entry in expected
+    ]
+
+
+def test_quoted_and_comma_export(tmp_path):
+    path = tmp_path / 'export.csv'
+    lines = pathlib.Path(TEST_FILE).read_text().splitlines()
+    path.write_text(
+        '\n'.join(
+            lines[:2]
+            + [lines[2].replace('* OP CREDIT BANQUE', '"OP; CREDIT"')]
+            + [line.replace('.', ',') for line in lines[3:]]
+            + ['Solde;;;;;;;;;;;;']
+        )
+    )
+    columns = columnar.read_columns(str(path))
+    assert len(columns) == 7
+    assert columns.label[1] == 'OP; CREDIT'
+    reference = columnar.read_columns(TEST_FILE)
+    assert columns.amount.tolist() == reference.amount.tolist()
+
+
+@pytest.mark.parametrize('quoted', [False, True])
+def test_export_with_footer(tmp_path, quoted):
+    path = tmp_path / 'export.csv'
+    lines = pathlib.Path(TEST_FILE).read_text().splitlines()
+    if quoted:
+        lines[1] = lines[1].replace('* OP DEBIT BANQUE', '"* OP DEBIT BANQUE"')
+    path.write_text('\n'.join(lines + ['Solde au 16/05/2020;;;', '']))
+    importer = CEImporter_CSV('Assets:CE', 'Expenses:FIXME', 'Income:FIXME')
+    entries = columnar.read_columns(str(path)).to_entries(
+        'Assets:CE', 'Expenses:FIXME', 'Income:FIXME'
+    )
+    assert len(entries) == 7
+    assert _summary(entries) == _summary(
+        importer.extract(cache.get_file(str(path)))
+    )
+
+
+def test_not_an_export(tmp_path):
+    path = tmp_path / 'notes.csv'
+    path.write_text('a;b\n1;2\n')
+    with pytest.raises(ValueError):
+        columnar.read_columns(str(path))
+
+
+def test_to_parquet(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    columns = columnar.read_columns(TEST_FILE)
+    columns.to_parquet(str(tmp_path / 'export.parquet'))
+    table = pq.read_table(str(tmp_path / 'export.parquet'))
+    assert table.column('amount').to_pylist() == columns.amount.tolist()
+    assert table.num_rows == 7
@@ -2,8 +2,14 @@ import pathlib
 import pytest
 import datetime
 
-from beancount_ce import __version__, CEImporter
+from beancount_ce import __version__, CEImporter, read_head, sniff_file_kind
+from beancount_ce.importer_csv import (
+    date_parser,
+    detect_date_pattern,
+    get_date,
+)
 from beancount.core.number import Decimal
+from beancount.ingest import cache
 
 TEST_FILE_PATH = 'test_csv_importer_statement.csv'
 
@@ -91,3 +97,86 @@ def test_extract(importer, filename):
         assert op.postings[0].account == 'Assets:CE', 'Wrong account name'
         assert op.postings[0].units.currency == 'EUR', 'Wrong currency'
         assert op.postings[0].units.number == op_test['amount'], 'Wrong amount'
+
+
+def test_iter_extract(importer, filename):
+    with open(filename) as fd:
+        transactions = importer.csv_importer.iter_extract(fd)
+        assert not isinstance(transactions, list)
+        first = next(transactions)
+        assert first.date == datetime.date(2020, 4, 17)
+        assert len(list(transactions)) == 6
+
+
+def test_iter_extract_rejects_foreign_csv(importer, tmp_path):
+    foreign = tmp_path / 'foreign.csv'
+    foreign.write_text('Date;Amount\n17/4/2020;-14.9\n')
+    with open(str(foreign)) as fd:
+        assert list(importer.csv_importer.iter_extract(fd)) == []
+        assert importer.extract(fd) is None
+
+
+@pytest.mark.parametrize(
+    's_date, pattern, expected',
+    [
+        ('17/4/2020', '', datetime.date(2020, 4, 17)),
+        ('2020/04/17', '', datetime.date(2020, 4, 17)),
+        ('17/04/2020', '%d/%m/%Y', datetime.date(2020, 4, 17)),
+        ('17/04/2020', '%Y/%m/%d', None),
+        ('2020-04-17', '%Y-%m-%d', datetime.date(2020, 4, 17)),
+        ('31/02/2020', '', None),
+        ('1/1/20', '', None),
+        ('+1/04/2020', '', None),
+        ('', '', None),
+    ],
+)
+def test_get_date(s_date, pattern, expected):
+    assert get_date(s_date, pattern=pattern) == expected
+
+
+def test_fast_date_parsers_match_strptime():
+    day = datetime.date(1999, 1, 1)
+    while day < datetime.date(2001, 1, 1):
+        for pattern in ('%Y/%m/%d', '%d/%m/%Y'):
+            s_date = day.strftime(pattern)
+            assert date_parser(pattern)(s_date) == day
+            assert detect_date_pattern(s_date) == pattern
+        day += datetime.timedelta(days=1)
+
+
+def test_sniff_file_kind(filename, tmp_path):
+    pdf = tmp_path / 'statement.pdf'
+    pdf.write_bytes(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    text = tmp_path / 'statement.txt'
+    text.write_text('Relevé de vos comptes\nwww.caisse-epargne.fr\n')
+    assert sniff_file_kind(str(filename)) == 'csv'
+    assert sniff_file_kind(str(pdf)) == 'pdf'
+    assert sniff_file_kind(str(text)) == 'text'
+
+
+def test_csv_routed_without_pdf_parse(importer, filename, monkeypatch):
+    def identify(file_):
+        raise AssertionError('PDF importer probed for a CSV export')
+
+    monkeypatch.setattr(importer.pdf_importer, 'identify', identify)
+    with open(filename) as fd:
+        assert importer.identify(fd)
+        assert importer.file_date(fd) == TEST_DATE
+        assert len(importer.extract(fd)) == 7
+    assert len(importer._routes) == 1
+
+
+def test_text_statement_with_delimiter_routed_to_pdf(tmp_path):
+    statement = (
+        pathlib.Path(__file__).parent / 'test_pdf_importer_statement.txt'
+    )
+    text = tmp_path / 'statement.txt'
+    text.write_text('Relevé; Page 1\n' + statement.read_text())
+    assert sniff_file_kind(str(text)) == 'csv'
+
+    importer = CEImporter('FR76 1234 5123 4512 3456 7890 130', 'Assets:CE')
+    file_ = cache.get_file(str(text))
+    assert importer.identify(file_)
+    assert len(importer.extract(file_)) == 7
+    # the head is read once, through the file memo
+    assert read_head in file_._cache
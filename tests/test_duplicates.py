@@ -0,0 +1,85 @@
+import datetime
+import pathlib
+
+import pytest
+from beancount.core import data
+from beancount.core.amount import Amount
+from beancount.core.number import Decimal
+
+from beancount_ce import CEImporter
+from beancount_ce.duplicates import (
+    DUPLICATE_META,
+    DuplicateIndex,
+    normalize_payee,
+)
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+def transaction(date, amount, payee, account='Assets:CE'):
+    return data.Transaction(
+        data.new_metadata('ledger.beancount', 0),
+        date,
+        '*',
+        payee,
+        '',
+        data.EMPTY_SET,
+        data.EMPTY_SET,
+        [
+            data.Posting(
+                account, Amount(Decimal(amount), 'EUR'), None, None, None, None
+            )
+        ],
+    )
+
+
+def test_normalize_payee():
+    assert normalize_payee('* CB  Achat-1 ') == normalize_payee('cb achat 1')
+    assert normalize_payee(None) == ''
+
+
+def test_duplicate_index():
+    day = datetime.date(2020, 4, 17)
+    index = DuplicateIndex(
+        [
+            transaction(day, '-14.9', 'CB ACHAT'),
+            transaction(day, '-14.90', 'CB ACHAT'),
+            transaction(day, '-14.90', 'CB ACHAT', account='Assets:Other'),
+        ],
+        accounts=['Assets:CE'],
+        window=2,
+    )
+    assert len(index) == 2
+
+    late = transaction(day + datetime.timedelta(days=2), '-14.90', 'cb achat')
+    assert DUPLICATE_META in index.mark(late).meta
+    assert not index.pop(transaction(day, '-14.91', 'CB ACHAT'))
+    assert not index.pop(transaction(day, '-14.90', 'CB ACHAT 2'))
+    assert not index.pop(
+        transaction(day + datetime.timedelta(days=3), '-14.90', 'CB ACHAT')
+    )
+    assert index.pop(transaction(day, '-14.90', 'CB ACHAT'))
+    assert not index.pop(transaction(day, '-14.90', 'CB ACHAT'))
+
+
+@pytest.mark.parametrize(
+    'file_name',
+    ['test_pdf_importer_statement.txt', 'test_csv_importer_statement.csv'],
+)
+def test_extract_marks_duplicates(file_name):
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+    with open(str(TESTS_DIR / file_name)) as fd:
+        entries = importer.extract(fd)
+        existing_entries = entries[:3]
+        marked = importer.extract(fd, existing_entries)
+
+    assert [DUPLICATE_META in entry.meta for entry in marked] == [True] * 3 + [
+        False
+    ] * (len(entries) - 3)
+
+
+def test_duplicate_meta_matches_beancount():
+    from beancount.ingest import extract
+
+    assert DUPLICATE_META == extract.DUPLICATE_META
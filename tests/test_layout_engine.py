@@ -0,0 +1,256 @@
+import datetime
+import logging
+import pathlib
+
+import pytest
+from beancount.core.number import Decimal
+
+from beancount_ce import CEImporter
+from beancount_ce.layout_engine import (
+    Columns,
+    Row,
+    Word,
+    find_columns,
+    parse_operation,
+    read_rows,
+)
+
+from benchmarks.pdf_writer import text_pages, write_pdf
+
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+SAVINGS_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 230'
+ACCOUNT_HEADER = 'MR PRENOM NOM - COMPTE DE DEPOT - N° 12345 12345 12345678901'
+SAVINGS_HEADER = 'MR PRENOM NOM - LIVRET A - N° 12345 12345 12345678902'
+DATE_X, LABEL_X, DEBIT_X, CREDIT_X = (40, 80, 430, 500)
+FONT_SIZE = 9
+# Helvetica advance widths of the characters of amounts, per 1000 units
+HELVETICA_WIDTHS = {',': 278, ' ': 278}
+
+
+def _width(text, font_size=FONT_SIZE):
+    return (
+        sum(HELVETICA_WIDTHS.get(char, 556) for char in text)
+        * font_size
+        / 1000
+    )
+
+
+def _header_row(y):
+    return [
+        (DATE_X, y, 'Date'),
+        (DEBIT_X, y, 'Débit'),
+        (CREDIT_X, y, 'Crédit'),
+    ]
+
+
+def _amount(column_x, header, y, amount):
+    # amounts are right aligned on their column header
+    return (column_x + _width(header) * 1.0 - _width(amount), y, amount)
+
+
+def _operation(y, date, label, amount, debit):
+    if debit:
+        return [
+            (DATE_X, y, date),
+            (LABEL_X, y, label),
+            _amount(DEBIT_X, 'Débit', y, amount),
+        ]
+    # credits are drawn before their date, as in the statements of the bank
+    return [
+        _amount(CREDIT_X, 'Crédit', y, amount),
+        (DATE_X, y, date),
+        (LABEL_X, y, label),
+    ]
+
+
+def _statement_pages():
+    first_page = [
+        (DATE_X, 800, 'Direct Ecureuil vos comptes 7j / 7'),
+        (DATE_X, 788, 'www.caisse-epargne.fr'),
+        (DATE_X, 770, 'Relevé'),
+        (DATE_X, 758, 'de vos comptes'),
+        (DATE_X, 746, 'au 16/05/2020 - N° 66 Page 1 / 2'),
+        (DATE_X, 720, 'MR PRENOM NOM'),
+        (DATE_X, 708, 'Identifiant client'),
+        (DATE_X, 696, 'SYNTHESE de vos comptes en euros'),
+        (DATE_X, 680, ACCOUNT_HEADER),
+        *_header_row(660),
+        (LABEL_X, 648, 'Détail des opérations en euros'),
+        (DATE_X, 636, 'SOLDE PRECEDENT AU 16/04/20'),
+        _amount(CREDIT_X, 'Crédit', 636, '912,63'),
+        *_operation(624, '17/04', '* OP DEBIT BANQUE', '14,90', True),
+        *_operation(612, '17/04', '* OP CREDIT BANQUE', '4,40', False),
+        *_operation(600, '20/04', 'VIR SEPA ENTRANT', '24,00', False),
+        (LABEL_X, 588, 'REMBOURSEMENT'),
+        (LABEL_X, 576, "-Réf. donneur d'ordre : 123456789012345678000001"),
+        *_operation(
+            564, '21/04', 'CB ACHAT 1          FACT 123456', '63,43', True
+        ),
+        *_operation(552, '27/04', 'PRLV Prlvt 1', '20,00', True),
+        (LABEL_X, 540, 'TEL mobile Prlvt SEPA 99-1ABCDE-01 001100022222'),
+    ]
+    second_page = [
+        (DATE_X, 800, 'au 16/05/2020 - N° 66 Page 2 / 2'),
+        (DATE_X, 780, ACCOUNT_HEADER + ' (suite)'),
+        *_header_row(760),
+        *_operation(748, '15/05', 'CB ACHAT 3 FACT 123456', '7,32', True),
+        (
+            DATE_X,
+            736,
+            'NOUVEAU SOLDE CREDITEUR AU 16/05/20 (en francs : 5 400,00) 837,31',
+        ),
+        (DATE_X, 700, SAVINGS_HEADER),
+        *_header_row(680),
+        *_operation(668, '02/05', 'VIR LIVRET A', '100,00', False),
+        (
+            DATE_X,
+            656,
+            'NOUVEAU SOLDE CREDITEUR AU 16/05/20 (en francs : 655,96) 100,00',
+        ),
+    ]
+    return [first_page, second_page]
+
+
+@pytest.fixture
+def statement_pdf(tmp_path):
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(str(pdf_file), _statement_pages())
+    return pdf_file
+
+
+def _importer(engine):
+    return CEImporter(
+        TEST_ACCOUNT_NUMBER,
+        'Assets:CE',
+        engine=engine,
+        accounts={SAVINGS_ACCOUNT_NUMBER: 'Assets:CE:LivretA'},
+    ).pdf_importer
+
+
+def test_read_rows(statement_pdf):
+    rows = read_rows(statement_pdf)
+    texts = [row.text for row in rows]
+    # the credit amount drawn first is read in the credit column
+    assert '17/04 * OP CREDIT BANQUE 4,40' in texts
+    assert 'Date Débit Crédit' in texts
+    assert [row.page for row in rows][-1] == 1
+
+
+def test_engines_agree(statement_pdf):
+    text_importer = _importer('text')
+    text = text_importer._getText(str(statement_pdf))
+    expected = text_importer._getOperationsByAccount(text)
+
+    rows = read_rows(statement_pdf)
+    operations = _importer('layout')._getLayoutOperationsByAccount(rows)
+
+    assert [account for (account, _) in expected] == [
+        'Assets:CE',
+        'Assets:CE:LivretA',
+    ]
+    # once flattened, the label and the amount of '27/04 PRLV Prlvt 1 20,00'
+    # read as an amount of 1 20,00, the words are far apart in the layout
+    prlv = expected[0][1][2]
+    assert prlv.payee == 'PRLV Prlvt 1' and prlv.amount == Decimal('-120.00')
+    expected[0][1][2] = prlv._replace(amount=Decimal('-20.00'))
+    assert operations == expected
+    assert len(operations[0][1]) == 6
+
+
+def test_layout_extract(statement_pdf):
+    with open(str(statement_pdf)) as fd:
+        entries = _importer('layout').extract(fd)
+    assert [(e.date, e.postings[0].units.number) for e in entries][:2] == [
+        (datetime.date(2020, 4, 17), Decimal('-14.90')),
+        (datetime.date(2020, 4, 21), Decimal('-63.43')),
+    ]
+    assert entries[-1].postings[0].account == 'Assets:CE:LivretA'
+
+
+def test_wrapped_debit_read_by_text_engine(tmp_path):
+    (first_page, second_page) = _statement_pages()
+    # the amount of a long debit label goes to the next row
+    first_page += [
+        (DATE_X, 528, '28/04'),
+        (LABEL_X, 528, 'PRLV SEPA ASSURANCE HABITATION'),
+        _amount(DEBIT_X, 'Débit', 516, '42,10'),
+    ]
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(str(pdf_file), [first_page, second_page])
+
+    rows = read_rows(pdf_file)
+    assert _importer('layout')._getLayoutOperationsByAccount(rows) is None
+    with open(str(pdf_file)) as fd:
+        entries = _importer('layout').extract(fd)
+    assert (datetime.date(2020, 4, 28), Decimal('-42.10')) in [
+        (e.date, e.postings[0].units.number) for e in entries
+    ]
+
+
+def test_text_statement_read_by_text_engine(tmp_path, caplog):
+    # one run a line, the amounts are not lined up with the column headers
+    text = pathlib.Path(__file__).parent / 'test_pdf_importer_statement.txt'
+    text = text.read_text().encode('cp1252', 'replace').decode('cp1252')
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(str(pdf_file), text_pages(text))
+
+    with open(str(pdf_file)) as fd:
+        expected = _importer('text').extract(fd)
+    with caplog.at_level(logging.WARNING, logger='beancount_ce'):
+        with open(str(pdf_file)) as fd:
+            entries = _importer('layout').extract(fd)
+
+    assert len(entries) == 7
+    assert entries == expected
+    (record,) = caplog.records
+    assert 'text engine' in record.getMessage()
+
+
+def _word(x0, text, height=9.0):
+    return Word(x0, x0 + len(text) * 5.0, height, text)
+
+
+@pytest.mark.parametrize(
+    'words, expected',
+    [
+        (
+            [
+                _word(40, '18/10'),
+                _word(80, 'LOYER'),
+                _word(455, '1'),
+                _word(461, '234,56'),
+            ],
+            ('18/10', 'LOYER', '1 234,56', True),
+        ),
+        (
+            [
+                _word(40, '18/10'),
+                _word(80, 'CB'),
+                _word(95, '1'),
+                _word(461, '234,56'),
+            ],
+            ('18/10', 'CB 1', '234,56', True),
+        ),
+        (
+            [_word(40, '19/10'), _word(80, 'VIREMENT'), _word(531, '12,50')],
+            ('19/10', 'VIREMENT', '12,50', False),
+        ),
+        ([_word(80, 'VALEUR AU 18/10'), _word(461, '4,45')], None),
+        (
+            [_word(40, '19/10'), _word(80, 'INTERETS'), _word(300, '4,45')],
+            None,
+        ),
+    ],
+)
+def test_parse_operation(words, expected):
+    columns = Columns(60.0, 470.0, 491.0, 540.0, 556.0)
+    operation = parse_operation(Row(0, tuple(words)), columns)
+    assert (operation and tuple(operation)) == expected
+
+
+def test_find_columns():
+    row = Row(
+        0, (_word(40, 'Date'), _word(430, 'Débit'), _word(500, 'Crédit'))
+    )
+    assert find_columns(row) == Columns(60.0, 430.0, 455.0, 500.0, 530.0)
+    assert find_columns(Row(0, (_word(40, 'Date'),))) is None
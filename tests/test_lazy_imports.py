@@ -0,0 +1,44 @@
+import pathlib
+import subprocess
+import sys
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+
+
+def _loaded_modules(script):
+    output = subprocess.run(
+        [sys.executable, '-c', script + '\nimport sys; print(*sys.modules)'],
+        cwd=str(TESTS_DIR.parent),
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return set(output.split())
+
+
+def test_import_does_not_load_pdfminer():
+    modules = _loaded_modules('import beancount_ce')
+    assert 'beancount_ce' in modules
+    assert 'pdfminer' not in modules
+    assert 'beancount.ingest.extract' not in modules
+
+
+def test_csv_import_does_not_load_pdfminer():
+    modules = _loaded_modules(
+        'from beancount.ingest import cache\n'
+        'from beancount_ce import CEImporter\n'
+        'importer = CEImporter("", "Assets:Courant", file_type=2)\n'
+        'file_ = cache.get_file({!r})\n'
+        'assert importer.extract(file_)'.format(
+            str(TESTS_DIR / 'test_csv_importer_statement.csv')
+        )
+    )
+    assert 'pdfminer' not in modules
+
+
+def test_pdf_import_loads_pdfminer():
+    modules = _loaded_modules(
+        'from beancount_ce import extract_statement\n'
+        'extract_statement.get_profile().laparams()'
+    )
+    assert 'pdfminer' in modules
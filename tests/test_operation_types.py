@@ -0,0 +1,98 @@
+import pathlib
+
+import pytest
+from beancount.ingest import cache
+
+from beancount_ce import (
+    CEImporter,
+    OperationClassifier,
+    operation_types,
+    register_operation_type,
+)
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+def test_classify():
+    classify = OperationClassifier().classify
+    assert classify('* OP DEBIT BANQUE') == 'BANK'
+    assert classify('INTERETS CREDITEURS') == 'BANK'
+    assert classify('versement express') == 'DEPOSIT'
+    assert classify('VIR SEPA ENTRANT') == 'WIRETRANSFER'
+    assert classify('VIREMENT PAR INTERNET') == 'WIRETRANSFER'
+    assert classify('REMISE CHEQUES') == 'CHECK'
+    assert classify('REMISE CHQ 123') == 'CHECK'
+    assert classify('CB CENTRE LECLERC') == 'CARDDEBIT'
+    assert classify('RET DAB 12/04') == 'WITHDRAWAL'
+    assert classify('PRLV FREE MOBILE') == 'DIRECTDEBIT'
+    assert classify('REMISE') == 'OTHER'
+    assert classify('') == 'OTHER'
+
+
+def test_extend_classifier():
+    classifier = OperationClassifier({'CB': 'CARDDEBIT'}, default='UNKNOWN')
+    classifier.add('CB REMBT', 'REFUND')
+    assert classifier.classify('CB REMBT AMAZON') == 'REFUND'
+    assert classifier.classify('CB AMAZON') == 'CARDDEBIT'
+    assert classifier.classify('PRLV') == 'UNKNOWN'
+
+
+@pytest.fixture
+def default_types(monkeypatch):
+    monkeypatch.setattr(
+        operation_types,
+        'OPERATION_TYPES',
+        dict(operation_types.OPERATION_TYPES),
+    )
+    monkeypatch.setattr(
+        operation_types, 'DEFAULT_CLASSIFIER', OperationClassifier()
+    )
+
+
+def test_register_operation_type(default_types):
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+    custom = CEImporter(
+        TEST_ACCOUNT_NUMBER,
+        'Assets:CE',
+        operation_types={'PAIEMENT PAYLIB': 'CARDDEBIT'},
+    )
+    register_operation_type('ECHEANCE PRET', 'LOAN')
+    assert importer.pdf_importer.classifier.classify('ECHEANCE PRET') == 'LOAN'
+    assert importer.csv_importer.classifier.classify('ECHEANCE PRET') == 'LOAN'
+    assert custom.pdf_importer.classifier.classify('PAIEMENT PAYLIB') == (
+        'CARDDEBIT'
+    )
+    assert custom.csv_importer.classifier.classify('ECHEANCE PRET') == 'OTHER'
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_csv_operation_types(workers):
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER,
+        'Assets:CE',
+        file_type=2,
+        creditCat='Income:FIXME',
+        showOperationTypes=True,
+        csv_workers=workers,
+        payee_rules={'VIR SEPA ENTRANT - ': 'Income:Never'},
+    )
+    entries = importer.extract(
+        cache.get_file(str(TESTS_DIR / 'test_csv_importer_statement.csv'))
+    )
+    payees = [entry.payee for entry in entries]
+    assert '* OP DEBIT BANQUE [Deb] - BANK' in payees
+    assert 'VIR SEPA ENTRANT - WIRETRANSFER' in payees
+    # payee rules do not see the operation type
+    transfer = entries[payees.index('VIR SEPA ENTRANT - WIRETRANSFER')]
+    assert transfer.postings[1].account == 'Income:FIXME'
+
+
+def test_pdf_debit_types():
+    importer = CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE', file_type=1)
+    with open(str(TESTS_DIR / 'test_pdf_importer_statement.txt')) as fd:
+        operations = importer.pdf_importer._getOperations(fd.read())
+    types = {op.payee: op.op_type for op in operations}
+    assert types['CB ACHAT 1'] == 'CARDDEBIT'
+    assert types['PRLV Prlvt 1'] == 'DIRECTDEBIT'
+    assert types['VIR SEPA ENTRANT'] == 'WIRETRANSFER'
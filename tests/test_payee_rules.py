@@ -0,0 +1,121 @@
+import pathlib
+import pickle
+
+import pytest
+
+from beancount.ingest import cache
+
+from beancount_ce import CEImporter, CEImporter_CSV, PayeeRules
+from beancount_ce.payee_rules import as_payee_rules
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+def test_payee_rules():
+    rules = PayeeRules(
+        contains={
+            'LECLERC': 'Expenses:Food',
+            'CENTRE LECLERC': 'Expenses:Food:Hypermarket',
+            'free': 'Expenses:Phone',
+            'he': 'A',
+            'she': 'B',
+            'hers': 'C',
+        },
+        prefixes={'CB ': 'Expenses:Card', 'VIR': 'Income:Transfer'},
+        patterns={
+            r'FACT \d+': 'Expenses:Invoice',
+            r'RETRAIT (?P<kind>DAB|GAB)': 'Expenses:Cash',
+        },
+    )
+    assert len(rules) == 10
+    # prefixes first, then the longest literal, then patterns
+    assert rules.account('CB CENTRE LECLERC FACT 161014') == 'Expenses:Card'
+    assert rules.account('PAIEMENT CENTRE LECLERC') == (
+        'Expenses:Food:Hypermarket'
+    )
+    assert rules.account('PRLV FREE MOBILE') == 'Expenses:Phone'
+    assert rules.account('vir sepa') == 'Income:Transfer'
+    # literals ending inside a longer one, through the failure links
+    assert rules.account('USHERS') == 'C'
+    assert rules.account('USHE') == 'B'
+    assert rules.account('RETRAIT GAB 12') == 'Expenses:Cash'
+    assert rules.account('PAIEMENT FACT 12') == 'Expenses:Invoice'
+    assert rules.account('DEPOT') is None
+    assert rules.account('') is None
+    assert PayeeRules().account('CB') is None
+
+    assert pickle.loads(pickle.dumps(rules)).account('USHERS') == 'C'
+    assert as_payee_rules(None) is None
+    assert as_payee_rules(rules) is rules
+    assert as_payee_rules({'CB': 'Expenses:Card'}).account('CB') == (
+        'Expenses:Card'
+    )
+
+
+def test_payee_rules_patterns_not_joined():
+    rules = PayeeRules(
+        patterns={
+            r'(\d\d)/\1': 'Expenses:SameDay',
+            r'(?s)PRLV.FREE': 'Expenses:Phone',
+            r'(?P<ref>FACT) \d+': 'Expenses:Invoice',
+            r'(?P<ref>REF) \d+': 'Expenses:Reference',
+            r'CB \d+': 'Expenses:Card',
+        }
+    )
+    assert len(rules._separate) == 4
+    # backreferences and inline flags keep their meaning
+    assert rules.account('RETRAIT 12/12') == 'Expenses:SameDay'
+    assert rules.account('RETRAIT 12/13') is None
+    assert rules.account('PRLV\nFREE') == 'Expenses:Phone'
+    # the leftmost match wins, then the first declared pattern
+    assert rules.account('REF 1 FACT 2') == 'Expenses:Reference'
+    assert rules.account('CB 12 FACT 2') == 'Expenses:Card'
+    assert rules.account('FACT 2 CB 12') == 'Expenses:Invoice'
+
+    with pytest.raises(ValueError, match=r"'CB \(' for Expenses:Card"):
+        PayeeRules(patterns={'CB (': 'Expenses:Card'})
+
+
+def _categories(entries):
+    return {
+        entry.payee: [posting.account for posting in entry.postings[1:]]
+        for entry in entries
+    }
+
+
+def test_csv_payee_rules():
+    rules = {'CB ACHAT': 'Expenses:Shopping', 'VIR SEPA': 'Income:Salary'}
+    path = str(TESTS_DIR / 'test_csv_importer_statement.csv')
+    for workers in (0, 1):
+        importer = CEImporter_CSV(
+            'Assets:CE', 'Expenses:FIXME', payee_rules=rules, workers=workers,
+        )
+        categories = _categories(importer.extract(cache.get_file(path)))
+        assert categories['VIR SEPA ENTRANT'] == ['Income:Salary']
+        assert categories['* OP DEBIT BANQUE [Deb]'] == ['Expenses:FIXME']
+        # no creditCat
+        assert categories['* OP CREDIT BANQUE [Cre]'] == []
+        assert all(
+            accounts == ['Expenses:Shopping']
+            for (payee, accounts) in categories.items()
+            if payee.startswith('CB ACHAT')
+        )
+
+
+def test_pdf_payee_rules():
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER,
+        'Assets:CE',
+        file_type=1,
+        expenseCat='Expenses:FIXME',
+        payee_rules=PayeeRules(prefixes={'CB ACHAT': 'Expenses:Shopping'}),
+    )
+    assert importer.pdf_importer.payee_rules is importer.payee_rules
+    entries = importer.extract(
+        cache.get_file(str(TESTS_DIR / 'test_pdf_importer_statement.txt'))
+    )
+    categories = _categories(entries)
+    assert categories['CB ACHAT 1'] == ['Expenses:Shopping']
+    assert categories['PRLV Prlvt 1'] == ['Expenses:FIXME']
+    assert categories['VIR SEPA ENTRANT'] == []
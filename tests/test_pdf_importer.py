@@ -1,10 +1,27 @@
 import pathlib
 import pytest
 import datetime
+import regex
 
-from beancount_ce import __version__, CEImporter
+from beancount_ce import (
+    __version__,
+    CEImporter,
+    CEMultiImporter,
+    Operation,
+    extract_statement,
+)
+from beancount_ce.regex_formatter import (
+    empty_line_regex,
+    longer_than_70_regex,
+    new_balance_regex,
+    one_character_line_regex,
+    smaller_than_2_regex,
+    trailing_spaces_and_tabs_regex,
+)
 from beancount.core.number import Decimal
 
+from benchmarks.pdf_writer import text_pages, write_pdf
+
 TEST_FILE_PATH = 'test_pdf_importer_statement.txt'
 
 TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
@@ -92,3 +109,260 @@ def test_extract(importer, filename):
         assert op.postings[0].account == 'Assets:CE', 'Wrong account name'
         assert op.postings[0].units.currency == 'EUR', 'Wrong currency'
         assert op.postings[0].units.number == op_test['amount'], 'Wrong amount'
+
+
+def test_text_extracted_once(importer, filename, monkeypatch):
+    calls = []
+    extract_text = extract_statement._extractText
+
+    def counting_extract_text(pdf_file, profile=None):
+        calls.append(pdf_file)
+        return extract_text(pdf_file, profile)
+
+    extract_statement.clear_text_cache()
+    monkeypatch.setattr(
+        extract_statement, '_extractText', counting_extract_text
+    )
+    with open(filename) as fd:
+        assert importer.identify(fd)
+        assert importer.file_date(fd) == TEST_DATE
+        assert len(importer.extract(fd)) == 7
+
+    assert calls == [str(filename)]
+
+
+def _fail_full_extraction(monkeypatch):
+    def full_extraction(pdf_file, profile=None):
+        raise AssertionError('Whole document laid out')
+
+    extract_statement.clear_text_cache()
+    monkeypatch.setattr(extract_statement, '_extractText', full_extraction)
+
+
+def test_identify_first_page(importer, tmp_path, monkeypatch):
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(
+        str(pdf_file),
+        [
+            [(50, 800, 'Direct Ecureuil'), (50, 780, 'www.caisse-epargne.fr')],
+            [(50, 800, 'Détail des opérations en euros')],
+        ],
+    )
+    _fail_full_extraction(monkeypatch)
+    with open(pdf_file) as fd:
+        assert importer.identify(fd)
+
+
+def test_identify_rejects_foreign_pdf(importer, tmp_path, monkeypatch):
+    pdf_file = tmp_path / 'invoice.pdf'
+    write_pdf(
+        str(pdf_file), [[(50, 800, 'FACTURE N° 2020-042')]] * 20,
+    )
+    _fail_full_extraction(monkeypatch)
+    with open(pdf_file) as fd:
+        assert not importer.identify(fd)
+
+
+def _flag_lines(text, patterns):
+    for pattern in patterns:
+        text = regex.sub(pattern, 'FLAG_DELETE_THIS_LINE', text, flags=regex.M)
+    return '\n'.join(
+        s for s in text.splitlines() if 'FLAG_DELETE_THIS_LINE' not in s
+    )
+
+
+def test_clean_statement(importer, filename):
+    with open(filename) as fd:
+        text = fd.read()
+    pdf_importer = importer.pdf_importer
+    statement = pdf_importer._clean_statement(text)
+    assert statement == _flag_lines(text, [one_character_line_regex])
+
+    for full, _ in pdf_importer._searchAccounts(statement):
+        account = statement.partition(full)[2]
+        expected = regex.split(new_balance_regex, account, flags=regex.M)[0]
+        words = (
+            full,
+            'Relevé',
+            'vos comptes',
+            'Page',
+            'Débit Crédit',
+            'Détail des opérations',
+            'frais bancaires et cotisations',
+            'SOLDE PRECEDENT AU',
+        )
+        expected = regex.sub(
+            longer_than_70_regex,
+            'FLAG_DELETE_THIS_LINE',
+            expected,
+            flags=regex.M,
+        )
+        expected = regex.sub(
+            r'^.*\b(' + '|'.join(words) + r')\b.*$',
+            'FLAG_DELETE_THIS_LINE',
+            expected,
+            flags=regex.M,
+        )
+        expected = regex.sub(
+            trailing_spaces_and_tabs_regex, '', expected, flags=regex.M
+        )
+        expected = _flag_lines(
+            expected, [empty_line_regex, smaller_than_2_regex]
+        )
+        assert pdf_importer._clean_account(account, full) == expected
+
+
+MULTI_ACCOUNT_STATEMENT = '''www.caisse-epargne.fr
+Relevé de vos comptes au 16/05/2020
+Identifiant client
+MR PRENOM NOM
+MR PRENOM NOM - COMPTE DE DEPOT - N° 12345 12345 12345678901
+Date Débit Crédit
+21/04 CB ACHAT 1          FACT 123456      63,43
+MR PRENOM NOM - LIVRET A - N° 12345 12345 12345678902
+Date Débit Crédit
+24,0020/04 VIR SEPA ENTRANT
+MR PRENOM NOM - PEL - N° 12345 12345 12345678903
+Date Débit Crédit
+22/04 CB ACHAT 2          FACT 123456      63,11
+4,4017/04 * OP CREDIT BANQUE
+'''
+
+
+@pytest.mark.parametrize(
+    'account_number, payees',
+    [
+        ('12345678901', ['CB ACHAT 1']),
+        ('12345678902', ['VIR SEPA ENTRANT']),
+        ('12345678903', ['CB ACHAT 2', '* OP CREDIT BANQUE']),
+    ],
+)
+def test_split_accounts(account_number, payees):
+    pdf_importer = CEImporter(
+        'FR76 1234 5123 45' + account_number + ' 30', 'Assets:CE'
+    ).pdf_importer
+    operations = pdf_importer._getOperations(MULTI_ACCOUNT_STATEMENT)
+    assert [op.payee for op in operations] == payees
+
+
+def test_multi_account_extract(tmp_path):
+    statement_file = tmp_path / 'statement.txt'
+    statement_file.write_text(MULTI_ACCOUNT_STATEMENT)
+    importer = CEMultiImporter(
+        {
+            'FR76 1234 5123 4512 3456 7890 130': 'Assets:CE:Depot',
+            'FR76 1234 5123 4512 3456 7890 330': 'Assets:CE:PEL',
+        }
+    )
+    with open(statement_file) as fd:
+        assert importer.file_account(fd) == 'Assets:CE:Depot'
+        operations = importer.extract(fd)
+
+    assert [(op.payee, op.postings[0].account) for op in operations] == [
+        ('CB ACHAT 1', 'Assets:CE:Depot'),
+        ('CB ACHAT 2', 'Assets:CE:PEL'),
+        ('* OP CREDIT BANQUE', 'Assets:CE:PEL'),
+    ]
+
+
+@pytest.fixture
+def statement_pdf(filename, tmp_path):
+    # cp1252 is all the fixture font can show
+    text = filename.read_text().encode('cp1252', 'replace').decode('cp1252')
+    notice = [
+        (
+            40,
+            800 - 12 * index,
+            'Conditions generales, article {}'.format(index),
+        )
+        for index in range(60)
+    ]
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(str(pdf_file), text_pages(text) + [notice])
+    return pdf_file
+
+
+@pytest.mark.parametrize('profile', ['default', 'fast', 'lean'])
+def test_extraction_profiles(filename, statement_pdf, profile):
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER, 'Assets:CE', extraction_profile=profile
+    )
+    extract_statement.clear_text_cache()
+    with open(statement_pdf) as pdf_fd, open(filename) as text_fd:
+        assert importer.identify(pdf_fd)
+        entries = importer.extract(pdf_fd)
+        expected = importer.extract(text_fd)
+    assert [(e.date, e.payee, e.postings) for e in entries] == [
+        (e.date, e.payee, e.postings) for e in expected
+    ]
+
+
+def test_skip_last_pages(statement_pdf):
+    default = extract_statement.get_profile()
+    text = extract_statement._extractText(str(statement_pdf), default)
+    assert 'Conditions generales' in text
+    lean = extract_statement._extractText(str(statement_pdf), 'lean')
+    assert 'Conditions generales' not in lean
+    assert text.startswith(lean)
+
+    # only the trailing pages without operations nor balance are left out
+    notices = default._replace(skip_last_pages=100)
+    assert extract_statement._extractText(
+        str(statement_pdf), notices
+    ) == extract_statement._extractText(
+        str(statement_pdf), default._replace(page_numbers=(0, 1, 2))
+    )
+
+
+def test_skip_last_pages_keeps_operations(filename, tmp_path):
+    lines = filename.read_text().encode('cp1252', 'replace').decode('cp1252')
+    lines = lines.splitlines()
+    # the last page only holds the operation of 15/05, before the balance
+    assert lines[166].startswith('15/05 CB ACHAT 3')
+    pdf_file = tmp_path / 'statement.pdf'
+    write_pdf(
+        str(pdf_file),
+        text_pages('\n'.join(lines[:160]))
+        + text_pages('\n'.join(lines[160:172])),
+    )
+
+    entries = {}
+    for profile in ('default', 'lean'):
+        importer = CEImporter(
+            TEST_ACCOUNT_NUMBER, 'Assets:CE', extraction_profile=profile
+        )
+        extract_statement.clear_text_cache()
+        with open(str(pdf_file)) as fd:
+            entries[profile] = importer.extract(fd)
+    assert len(entries['default']) == 7
+    assert entries['lean'] == entries['default']
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        CEImporter(TEST_ACCOUNT_NUMBER, 'Assets:CE', extraction_profile='slow')
+
+
+def test_operations(importer, filename):
+    with open(filename) as fd:
+        operations = importer.pdf_importer._getOperations(fd.read())
+
+    assert all(isinstance(op, Operation) for op in operations)
+    assert operations[0] == Operation(
+        datetime.date(2020, 4, 17),
+        'MR PRENOM NOM - COMPTE DE DEPOT - N° 12345 12345 12345678901',
+        'BANK',
+        '',
+        '* OP DEBIT BANQUE',
+        Decimal('-14.90'),
+    )
+    assert operations[0].debit and not operations[-1].debit
+    assert operations[-1].amount == Decimal('24.00')
+
+
+def test_operation_year(importer):
+    set_year = importer.pdf_importer._set_operation_year
+    assert set_year('17/12', TEST_DATE) == datetime.date(2019, 12, 17)
+    assert set_year('29/02', datetime.date(2020, 3, 1)) == datetime.date(
+        2020, 2, 29
+    )
@@ -0,0 +1,101 @@
+import pathlib
+import random
+import time
+
+import regex
+
+from beancount_ce import CEImporter_PDF
+from beancount_ce.regex_formatter import (
+    credit_regex,
+    debit_regex,
+    iter_credit_matches,
+    iter_debit_matches,
+)
+
+TEST_FILE_PATH = 'test_pdf_importer_statement.txt'
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+# The legacy regexes let a thousands separator be a line break, reading
+# '12' ending a line and '743,75' starting the next one as 12 743,75. The
+# matchers keep amounts on a single line.
+DEBIT_REGEX = debit_regex.replace(r'\s{1}', r'[^\S\n]')
+CREDIT_REGEX = credit_regex.replace(r'\s{1}', r'[^\S\n]')
+
+
+def _legacy_matches(pattern, account):
+    return [
+        (
+            match.group('op_dte'),
+            match.group('op_lbl'),
+            match.group('op_amt'),
+            account[match.start() : match.end()].split('\n')[0],
+        )
+        for match in regex.finditer(pattern, account, flags=regex.M)
+    ]
+
+
+def _assert_same_matches(account):
+    assert [tuple(m) for m in iter_debit_matches(account)] == (
+        _legacy_matches(DEBIT_REGEX, account)
+    )
+    assert [tuple(m) for m in iter_credit_matches(account)] == (
+        _legacy_matches(CREDIT_REGEX, account)
+    )
+
+
+def _random_line(rand):
+    date = '%02d/%02d' % (rand.randint(1, 28), rand.randint(1, 12))
+    amount = rand.choice(['%d,%02d', '%d 123,%02d', '%d000,%02d']) % (
+        rand.randint(1, 999),
+        rand.randint(0, 99),
+    )
+    label = ' '.join(
+        rand.choice(['CB', 'FACT', '123456', 'VIR', '12', '4,45', 'X'])
+        for _ in range(rand.randint(0, 4))
+    )
+    return rand.choice(
+        [
+            '{date} {label}      {amount}',
+            '{amount}{date} {label}',
+            ' VALEUR AU {date}     {amount}',
+            ' {label} {date} {amount}',
+            '{date} {label}',
+            '{date}{label}{amount}',
+            '{label} {amount}',
+            '{amount}',
+            'X{label}',
+        ]
+    ).format(date=date, amount=amount, label=label)
+
+
+def test_matchers_on_test_statement():
+    filename = pathlib.Path(__file__).parent.absolute() / TEST_FILE_PATH
+    importer = CEImporter_PDF(TEST_ACCOUNT_NUMBER, 'Assets:CE')
+    with open(filename) as fd:
+        statement = fd.read()
+    for full, _ in importer._searchAccounts(statement):
+        account = importer._clean_account(statement.partition(full)[2], full)
+        _assert_same_matches(account)
+        assert len(list(iter_debit_matches(account))) == 5
+        assert len(list(iter_credit_matches(account))) == 2
+
+
+def test_matchers_on_random_accounts():
+    rand = random.Random(42)
+    for _ in range(2000):
+        lines = [_random_line(rand) for _ in range(rand.randint(1, 12))]
+        _assert_same_matches('\n'.join(line.rstrip() for line in lines))
+
+
+def test_matchers_scale_linearly():
+    lines = []
+    for index in range(2500):
+        lines.append(' '.join(['%02d/04' % (index % 28 + 1)] + ['12,34'] * 9))
+        lines.append(' VALEUR AU 18/10 ' + '1,23 ' * 8 + '4,45')
+    account = '\n'.join(lines)
+
+    start = time.perf_counter()
+    debits = list(iter_debit_matches(account))
+    credits = list(iter_credit_matches(account))
+    assert time.perf_counter() - start < 2.0
+    assert len(debits) == 2500 and not credits
@@ -0,0 +1,138 @@
+import datetime
+import pathlib
+import shutil
+
+import pytest
+
+from beancount_ce import CEImporter, state
+from beancount_ce.state import ImportState, state_path
+
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+TEST_ACCOUNT_NUMBER = 'FR76 1234 5123 4512 3456 7890 130'
+
+
+def test_state_save_merges(tmp_path):
+    path = state_path(str(tmp_path), 'Assets:FR:CdE:CompteCourant')
+    assert pathlib.Path(path).name == 'Assets.FR.CdE.CompteCourant.json'
+
+    first = ImportState(path)
+    second = ImportState(path)
+    first.record_statement('aaa', datetime.date(2020, 5, 16))
+    first.record_date(datetime.date(2020, 5, 15))
+    first.save()
+    second.record_statement('bbb')
+    second.record_date(datetime.date(2020, 4, 1))
+    second.save()
+
+    state = ImportState(path)
+    assert state.statements == {'aaa': '2020-05-16', 'bbb': ''}
+    assert state.last_date == datetime.date(2020, 5, 15)
+
+
+def test_state_ignores_corrupted_file(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text('{not json')
+    state = ImportState(str(path))
+    assert state.statements == {} and state.last_date is None
+
+
+def test_pdf_statement_imported_once(tmp_path):
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER, 'Assets:CE', state_dir=str(tmp_path / 'state')
+    )
+    statement = tmp_path / 'statement.txt'
+    shutil.copy(
+        str(TESTS_DIR / 'test_pdf_importer_statement.txt'), str(statement)
+    )
+    with open(str(statement)) as fd:
+        assert len(importer.extract(fd)) > 0
+        assert importer.extract(fd) == []
+
+    state = ImportState(state_path(str(tmp_path / 'state'), 'Assets:CE'))
+    assert list(state.statements.values()) == ['2020-05-16']
+
+
+def test_csv_rows_imported_once(tmp_path):
+    importer = CEImporter(
+        TEST_ACCOUNT_NUMBER, 'Assets:CE', state_dir=str(tmp_path / 'state')
+    )
+    lines = (
+        (TESTS_DIR / 'test_csv_importer_statement.csv')
+        .read_text()
+        .splitlines(keepends=True)
+    )
+    old_export = tmp_path / 'old.csv'
+    old_export.write_text(''.join(lines[:5]))
+    new_export = tmp_path / 'new.csv'
+    new_export.write_text(''.join(lines[:1] + lines[4:]))
+
+    with open(str(old_export)) as fd:
+        assert len(importer.extract(fd)) == 4
+        assert importer.extract(fd) == []
+    with open(str(new_export)) as fd:
+        dates = [entry.date for entry in importer.extract(fd)]
+    # The last booking day is read again, operations may have been booked
+    # on it after the previous export.
+    assert dates == [
+        datetime.date(2020, 4, 21),
+        datetime.date(2020, 4, 22),
+        datetime.date(2020, 4, 27),
+        datetime.date(2020, 5, 15),
+    ]
+
+
+def test_state_saved_from_threads(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = state_path(str(tmp_path), 'Assets:CE')
+
+    def save(digest):
+        state = ImportState(path)
+        state.record_statement(digest)
+        state.save()
+
+    digests = ['{:03d}'.format(number) for number in range(32)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(save, digests))
+    assert sorted(ImportState(path).statements) == digests
+
+
+def _save_from_process(path, digest):
+    state = ImportState(path)
+    state.record_statement(digest)
+    state.save()
+
+
+def test_state_saved_from_processes(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    path = state_path(str(tmp_path), 'Assets:CE')
+    digests = ['{:03d}'.format(number) for number in range(32)]
+    with ProcessPoolExecutor(8) as executor:
+        list(executor.map(partial(_save_from_process, path), digests))
+    assert sorted(ImportState(path).statements) == digests
+
+
+class _HeldLock:
+    # msvcrt of a Windows system where another process holds the lock
+    LK_LOCK = 1
+    LK_UNLCK = 0
+
+    def __init__(self):
+        self.calls = 0
+
+    def locking(self, fileno, mode, nbytes):
+        self.calls += 1
+        raise OSError('Resource deadlock avoided')
+
+
+def test_state_lock_gives_up_on_windows(tmp_path, monkeypatch):
+    msvcrt = _HeldLock()
+    monkeypatch.setattr(state, 'fcntl', None)
+    monkeypatch.setattr(state, 'msvcrt', msvcrt, raising=False)
+    imported = ImportState(str(tmp_path / 'Assets.CE.json'))
+    imported.record_statement('digest', datetime.date(2020, 5, 16))
+    with pytest.raises(TimeoutError):
+        imported.save()
+    assert msvcrt.calls == state.LOCK_ATTEMPTS
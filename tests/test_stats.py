@@ -0,0 +1,78 @@
+import json
+import logging
+import pathlib
+
+from beancount.ingest import cache
+
+from beancount_ce import CEImporter
+from beancount_ce.stats import NULL_STATS, ImportStats, new_stats
+
+TEST_PDF_ACCOUNT = 'FR76 1234 5123 4512 3456 7890 130'
+TESTS_DIR = pathlib.Path(__file__).parent.absolute()
+
+
+def test_stage_adds_up():
+    stats = ImportStats('statement.pdf', 'importer')
+    for _ in range(3):
+        with stats.stage('scan'):
+            pass
+    stats.count('operations', 2)
+    stats.count('operations')
+    assert set(stats.seconds) == {'scan'}
+    assert stats.counts['operations'] == 3
+    line = stats.log_line()
+    assert line.startswith('import_stats ')
+    assert json.loads(line.split(' ', 1)[1])['counts'] == {'operations': 3}
+
+
+def test_no_listener():
+    assert new_stats('statement.pdf', 'importer') is NULL_STATS
+    with NULL_STATS.stage('scan'):
+        NULL_STATS.count('operations')
+
+
+def test_pdf_stats():
+    reports = []
+    importer = CEImporter(
+        TEST_PDF_ACCOUNT, 'Assets:Courant', on_stats=reports.append
+    )
+    file_ = cache.get_file(str(TESTS_DIR / 'test_pdf_importer_statement.txt'))
+    entries = importer.extract(file_)
+    importer.extract(file_)
+
+    (stats, again) = reports
+    assert {
+        'total',
+        'identify',
+        'extraction',
+        'cleaning',
+        'split',
+        'debit_scan',
+        'credit_scan',
+        'entries',
+    } <= set(stats.seconds)
+    assert stats.counts['operations'] == len(entries)
+    assert (
+        stats.counts['debits'] + stats.counts['credits']
+        >= stats.counts['operations']
+    )
+    assert stats.counts['lines'] > 0
+    assert again.counts['text_cache_hits'] >= 1
+
+
+def test_csv_stats_logged(caplog):
+    importer = CEImporter(
+        'FR00 0000 0000 0000 0000 0000 000',
+        'Assets:Courant',
+        file_type=2,
+        log_stats=True,
+    )
+    file_ = cache.get_file(str(TESTS_DIR / 'test_csv_importer_statement.csv'))
+    with caplog.at_level(logging.INFO, logger='beancount_ce'):
+        entries = importer.extract(file_)
+
+    (record,) = caplog.records
+    stats = json.loads(record.getMessage().split(' ', 1)[1])
+    assert stats['counts']['operations'] == len(entries)
+    assert stats['counts']['lines'] == len(entries)
+    assert 'rows' in stats['seconds']